@@ -0,0 +1,31 @@
+"""Benchmark ``SEIR2.dxdt`` vs. the allocation-free ``SEIR2.dxdt_into``.
+
+Run from anywhere (with corona installed): ``python benchmarks/dxdt.py``.
+"""
+
+## Imports
+from timeit import repeat
+
+from corona.maths import *
+from corona.model import *
+
+model = SEIR2()
+nVar = len(model.Variables._fields)
+
+
+def best_of(stmt, number):
+    "Min. time (seconds) per call of ``stmt``."
+    return min(repeat(stmt, number=number, repeat=5)) / number
+
+
+## Run
+print(f"{'N':>7} {'dxdt':>10} {'dxdt_into':>10} {'speedup':>8}")
+for N in [1, 300, 100_000]:
+    x   = np.asfortranarray(rand(N, nVar))
+    out = np.empty_like(x)
+    assert np.array_equal(model.dxdt(x, 0), model.dxdt_into(x, 0, out))
+
+    number = max(1, 10**5 // N)
+    t_old = best_of(lambda: model.dxdt(x, 0), number)
+    t_new = best_of(lambda: model.dxdt_into(x, 0, out), number)
+    print(f"{N:>7} {t_old*1e6:>8.1f}us {t_new*1e6:>8.1f}us {t_old/t_new:>7.1f}x")
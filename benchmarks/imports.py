@@ -0,0 +1,24 @@
+"""Benchmark the import time of ``corona`` modules (each in a fresh interpreter).
+
+Compare with ``python -X importtime -c "import corona.model"`` for details.
+"""
+
+## Imports
+import subprocess
+import sys
+
+modules = ["numpy", "corona.model", "corona.maths", "corona.plotting", "corona.enkf", "corona.sweep"]
+
+
+def import_time(module, repeat=5):
+    "Best-of wall time (s) of importing ``module``, excl. interpreter startup."
+    code = f"import time; t=time.perf_counter(); import {module}; print(time.perf_counter()-t)"
+    times = [float(subprocess.run([sys.executable, "-c", code], capture_output=True,
+                                  text=True, check=True).stdout) for _ in range(repeat)]
+    return min(times)
+
+
+## Run
+print(f"{'module':<17} {'import':>8}")
+for module in modules:
+    print(f"{module:<17} {import_time(module)*1e3:7.0f}m")
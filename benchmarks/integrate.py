@@ -0,0 +1,46 @@
+"""Benchmark ``integrate`` (``RKStepper``) vs. the plain ``rk4`` loop.
+
+Cases: the 2000-step ``epcalc.py`` run, and 365-day ensemble runs.
+"""
+
+## Imports
+from timeit import repeat
+
+from corona.maths import *
+from corona.model import *
+
+model = SEIR2()
+nPop  = 7*10**6
+
+
+def integrate_rk4(f, x0, tt):
+    "The former ``integrate``: calls ``rk4`` (allocating) at each step."
+    xx = zeros(tt.shape+x0.shape)
+    xx[0] = x0
+    for k,t in enumerate(tt[:-1]):
+        xx[k+1] = rk4(f, xx[k], t, tt[k+1]-t)
+    return xx
+
+
+def best_of(stmt):
+    return min(repeat(stmt, number=1, repeat=3))
+
+
+## Run
+cases = {
+    "epcalc (2001 steps)": (linspace(0, 200, 2001), None),
+    "ens N=300 (366 d)"  : (linspace(0, 365, 366), 300),
+    "ens N=10^4 (366 d)" : (linspace(0, 365, 366), 10**4),
+}
+print(f"{'case':<20} {'rk4 loop':>9} {'stepper':>9} {'inplace':>9}")
+for name, (tt, N) in cases.items():
+    x0 = model.init_state(Infected=1/nPop)
+    if N:
+        x0 = np.asfortranarray(x0 + zeros((N, len(x0))))
+    ref = integrate_rk4(model.dxdt, x0, tt)
+    assert np.array_equal(ref, integrate(model.dxdt_into, x0, tt, inplace=True))
+
+    t0 = best_of(lambda: integrate_rk4(model.dxdt, x0, tt))
+    t1 = best_of(lambda: integrate(model.dxdt, x0, tt))
+    t2 = best_of(lambda: integrate(model.dxdt_into, x0, tt, inplace=True))
+    print(f"{name:<20} {t0:>8.3f}s {t1:>8.3f}s {t2:>8.3f}s")
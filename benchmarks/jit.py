@@ -0,0 +1,32 @@
+"""Benchmark the numba backend vs. the numpy backend of ``integrate_seir2``."""
+
+## Imports
+from timeit import repeat
+
+from corona.maths import *
+from corona.model import *
+from corona import jit
+
+nPop = 7*10**6
+x0   = SEIR2().init_state(Infected=1/nPop)
+
+
+def best_of(stmt):
+    return min(repeat(stmt, number=1, repeat=3))
+
+
+## Run
+cases = {
+    "epcalc (2001 steps)": (linspace(0, 200, 2001), 1),
+    "ens N=300 (366 d)"  : (linspace(0, 365, 366), 300),
+    "ens N=10^4 (366 d)" : (linspace(0, 365, 366), 10**4),
+}
+print(f"{'case':<20} {'numpy':>8} {'numba':>8} {'max diff':>9}")
+for name, (tt, N) in cases.items():
+    model = SEIR2Ensemble.from_kwargs(N, Rep0=2 + rand(N))
+    E0    = np.asfortranarray(x0 + zeros((N, len(x0))))
+    a = jit.integrate_seir2(model, E0, tt, "numpy")
+    b = jit.integrate_seir2(model, E0, tt, "numba") # Also compiles
+    t0 = best_of(lambda: jit.integrate_seir2(model, E0, tt, "numpy"))
+    t1 = best_of(lambda: jit.integrate_seir2(model, E0, tt, "numba"))
+    print(f"{name:<20} {t0:>7.3f}s {t1:>7.3f}s {abs(a-b).max():>9.1e}")
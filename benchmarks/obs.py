@@ -0,0 +1,30 @@
+"""Benchmark the (cached) obs. loader vs. ``pd.read_csv``, on a long ``dash1.py``-style file."""
+
+## Imports
+import os
+import tempfile
+from timeit import repeat
+
+import pandas as pd
+
+from corona.maths import *
+from corona.obs import load
+
+
+def best_of(stmt):
+    return min(repeat(stmt, number=1, repeat=5))
+
+
+## Run
+print(f"{'rows':>6} {'read_csv':>9} {'parse':>9} {'cached':>9}")
+with tempfile.TemporaryDirectory() as tmp:
+    for n in [60, 2000, 20000]:
+        path = os.path.join(tmp, f"{n}.txt")
+        df = pd.DataFrame(dict(date=pd.date_range("1960-1-1", periods=n),
+                               confirmed=arange(n), deaths=arange(n)//3, recovered=arange(n)//2))
+        with open(path, "w") as F: F.write(df.to_string(index=False))
+        load(path) # Create cache
+        t_pd = best_of(lambda: pd.read_csv(path, sep=r'\s+', index_col=0, parse_dates=True))
+        t_np = best_of(lambda: load(path, cache=False))
+        t_c  = best_of(lambda: load(path))
+        print(f"{n:>6} {t_pd*1e3:8.2f}m {t_np*1e3:8.2f}m {t_c*1e3:8.2f}m")
@@ -0,0 +1,23 @@
+"""Throughput of ``integrate_parallel`` vs. number of processes."""
+
+## Imports
+import os
+from time import perf_counter
+
+from corona.maths import *
+from corona.model import *
+from corona.parallel import integrate_parallel
+
+N   = 10**5
+tt  = linspace(0, 365, 366)
+ens = SEIR2Ensemble.from_kwargs(N, Rep0=2+rand(N))
+E0  = ens.init_state(Infected=1e-6) + zeros((N, 10))
+
+## Run
+print(f"{'nproc':>5} {'time':>8} {'members/s':>10}")
+for nproc in sorted({1, 2, 4, os.cpu_count()}):
+    t0 = perf_counter()
+    xx = integrate_parallel(ens, E0, tt, nproc)
+    dt = perf_counter() - t0
+    print(f"{nproc:>5} {dt:>7.2f}s {N/dt:>10.0f}")
+    del xx
@@ -0,0 +1,45 @@
+"""Benchmark ``integrate_split`` vs. ``integrate`` (in-place ``rk4`` of the full state).
+
+Cases: a single state, and 365-day ensemble runs,
+with shared or member-wise IQR params (the latter making the propagator 3D).
+"""
+
+## Imports
+from timeit import repeat
+
+from corona.maths import *
+from corona.model import *
+from corona.prior import iChi2
+
+model = SEIR2()
+nPop  = 7*10**6
+tt    = linspace(0, 365, 366)
+
+
+def best_of(stmt):
+    return min(repeat(stmt, number=1, repeat=3))
+
+
+## Run
+cases = {
+    "N=1"                  : (None   , False),
+    "N=1000"               : (1000   , False),
+    "N=1000 (IQR params)"  : (1000   , True),
+    "N=10^4 (IQR params)"  : (10**4  , True),
+    "N=3*10^4 (IQR params)": (3*10**4, True), # xx: 0.9 GB
+}
+print(f"{'case':<21} {'integrate':>10} {'split':>9} {'speedup':>8}")
+for name, (N, iqr) in cases.items():
+    x0  = model.init_state(Infected=1/nPop)
+    ens = model
+    if N:
+        x0  = np.asfortranarray(x0 + zeros((N, len(x0))))
+        ens = SEIR2Ensemble.from_kwargs(N, model)
+        if iqr:
+            ens.pDead = iChi2(model.pDead).rvs(N)
+            ens.dt_H  = iChi2(model.dt_H).rvs(N)
+    assert np.allclose(integrate_split(ens, x0, tt), integrate(ens.dxdt_into, x0, tt, inplace=True), atol=1e-5)
+
+    t0 = best_of(lambda: integrate(ens.dxdt_into, x0, tt, inplace=True))
+    t1 = best_of(lambda: integrate_split(ens, x0, tt))
+    print(f"{name:<21} {t0:>9.3f}s {t1:>8.3f}s {t0/t1:>7.1f}x")
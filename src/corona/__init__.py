@@ -1,11 +1,14 @@
 # -*- coding: utf-8 -*-
-from pkg_resources import get_distribution, DistributionNotFound
+# Change here if project is renamed and does not equal the package name
+dist_name = 'Corona'
 
-try:
-    # Change here if project is renamed and does not equal the package name
-    dist_name = 'Corona'
-    __version__ = get_distribution(dist_name).version
-except DistributionNotFound:
-    __version__ = 'unknown'
-finally:
-    del get_distribution, DistributionNotFound
+
+def __getattr__(name):
+    # The version lookup is slow-ish, so only do it when requested.
+    if name == "__version__":
+        from importlib.metadata import version, PackageNotFoundError
+        try:
+            return version(dist_name)
+        except PackageNotFoundError:
+            return 'unknown'
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
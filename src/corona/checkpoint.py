@@ -0,0 +1,66 @@
+"""Checkpointing of the filter state, for resuming the assimilation when new obs. arrive.
+
+A checkpoint (``.npz``) contains:
+
+- ``k``: the time index (of the last assimilated obs.) and ``E``: the ensemble thereat,
+- ``yy``: the obs. assimilated so far, to detect revisions of the data,
+- the state of the random number generator,
+- the arrays of each ``Recorder``,
+- ``meta``: a string describing the configuration (e.g. ``repr`` of the model),
+  which must match for the checkpoint to be used.
+"""
+import json
+
+from corona.utils import *
+from corona.maths import *
+
+
+def _get_state(rng):
+    if isinstance(rng, np.random.Generator):
+        return rng.bit_generator.state
+    state = rng.get_state(legacy=False)
+    state["state"]["key"] = state["state"]["key"].tolist()
+    return state
+
+
+def _set_state(rng, state):
+    if isinstance(rng, np.random.Generator):
+        rng.bit_generator.state = state
+    else:
+        state["state"]["key"] = np.array(state["state"]["key"], np.uint32)
+        rng.set_state(state)
+
+
+def save(path, k, E, yy, recorders={}, rng=np.random, meta=""):
+    "Write the checkpoint (atomically). ``recorders``: dict of ``Recorder``s."
+    arrays = dict(k=k, E=E, yy=yy, meta=meta, rng=json.dumps(_get_state(rng)))
+    for name, rec in recorders.items():
+        for attr, val in vars(rec).items():
+            arrays[f"{name}.{attr}"] = val
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as F:
+        np.savez_compressed(F, **arrays)
+    os.replace(tmp, path)
+
+
+def load(path, yy, recorders={}, rng=np.random, meta=""):
+    """Read the checkpoint, restoring (in place) the ``recorders`` and ``rng``.
+
+    Returns ``(k, E)``, or ``None`` if the checkpoint does not exist,
+    or if its ``meta`` or obs. (vs. ``yy[:len(obs)]``) differ,
+    in which case one should start from scratch.
+    """
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        if str(data["meta"]) != meta:
+            print("Checkpoint ignored: different config.")
+            return None
+        if len(yy) < len(data["yy"]) or not np.array_equal(yy[:len(data["yy"])], data["yy"]):
+            print("Checkpoint ignored: the obs. have been revised.")
+            return None
+        for name, rec in recorders.items():
+            for attr in vars(rec):
+                setattr(rec, attr, data[f"{name}.{attr}"])
+        _set_state(rng, json.loads(str(data["rng"])))
+        return int(data["k"]), data["E"]
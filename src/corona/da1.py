@@ -6,6 +6,12 @@ from corona.utils import *
 from corona.maths import *
 from corona.model import *
 from corona.plotting import *
+from corona.enkf import analysis
+from corona import pf
+from corona.recorder import Recorder
+from corona.prior import Prior, iChi2
+from corona import checkpoint
+from corona.obs import load as load_obs
 
 np.random.seed(3)
 
@@ -35,14 +41,21 @@ nPop = 5.368e6
 
 
 ## Init ensemble
-def iChi2(mean,var=None):
-    if var is None:
-        var = (mean/10)**2
-    def _iChi2(s,nu):
-        return ss.invgamma(a=nu/2, scale=nu/2*s)
-    nu = 4 + 2*mean**2/var
-    s = mean*(nu-2)/nu
-    return _iChi2(s,nu)
+_mean = array([1,10]) / nPop
+_corr = array([[1,.8],[.8,1]])
+_std  = _mean / 10
+prior = Prior(
+    marginals=dict(
+        Rep0             = iChi2(model.Rep0, 1.5**2),
+        Rep_intervention = iChi2(model.Rep_intervention, 0.7**2),
+        pDead            = iChi2(model.pDead),
+        pSevr            = iChi2(model.pSevr),
+    ),
+    gauss={("Infected", "Exposed"): (_mean, _std[:,None] * _corr * _std)},
+    constraints=[
+        lambda x: x["pDead"] + x["pSevr"] < 1,
+        lambda x: (0 <= x["Infected"]) & (0 <= x["Exposed"]),
+    ])
 
 def X0_sample(N):
     # Defaults
@@ -50,122 +63,99 @@ def X0_sample(N):
     ens_par = {k:getattr(model,k)*ones(N) for k in parameters}
     E = {**ens_var, **ens_par}
 
-    # E["Infected"] =  1/nPop + 0.1/nPop * randn(N)
-    # E["Exposed"]  = 10/nPop +   1/nPop * randn(N)
-    _mean = array([1,10]) / nPop
-    _corr = array([[1,.8],[.8,1]])
-    _std  = _mean / 10
-    _cov  = _std[:,None] * _corr * _std
-    IE = ss.multivariate_normal(_mean, _cov).rvs(N).clip(min=0)
-    E["Infected"], E["Exposed"] = IE.T
+    E.update(prior.sample(N, method=sampling))
     E["Susceptible"] = 1 - E["Infected"] - E["Exposed"]
-
-    E["Rep0"             ] = iChi2(model.Rep0, 1.5**2).rvs(N)
-    E["Rep_intervention" ] = iChi2(model.Rep_intervention, 0.7**2).rvs(N)
-    E["pDead"            ] = iChi2(model.pDead).rvs(N)
-    E["pSevr"            ] = iChi2(model.pSevr).rvs(N)
-
-    assert np.all( E["pDead"] + E["pSevr"] < 1 )
-    for k in E: assert np.all( 0 <= E[k] )
     return E
 
 # Ens size
 N = 300
+sampling = "mc" # or "sobol", "halton", "lhs" (quasi-random)
 E0 = X0_sample(N)
 # sns.jointplot("pDead", "pSevr", data=E, marginal_kws=dict(bins=50, rug=True), kind="reg")
 E = np.array(list(E0.values())).T
 
 
 ## Obs
-# Load
-obs_df = pd.read_csv("Norway.txt", sep='\s+', index_col=0, parse_dates=True)
-# Compute days relative to date0
-rel_dates = pd.Series(obs_df.index - date0)
+# Load (cached)
+days, obs = load_obs("Norway.txt", date0)
 # Validate
-assert all(rel_dates.dt.seconds==0), "Timestamps are not integer days."
-datespan = rel_dates.iloc[-1]-rel_dates.iloc[0]
-assert len(rel_dates)-1 == datespan.days, "Some days are missing."
-# Set index 
-obs_df.index = rel_dates.dt.days
-# Crop to start from 0
-obs_df = obs_df.loc[0:,:]
-
-# Extract obs
-yy = obs_df["deaths"].to_numpy()
+assert np.all(np.diff(days) == 1), "Some days are missing."
+
+# Extract obs -- starting from day 0
+yy = obs["deaths"][days >= 0]
 # Make non-cumulative
 yy = np.diff(yy, prepend=0)
 # Obs error matrix
 R = 1*eye(1)
-Ri = inv(R)
-Rm12 = sqrtm(inv(R))
 # Obs operator
 i_obs = StateVector._fields.index("R_fatl")
 def Obs(x):
     return x[...,[i_obs]]
 
 infl = 1.
-def analysis(E,y):
-    N = len(E)
-    N1 = N-1
-    for j in [0]:
-        Eo = Obs(E)
-        xo = mean(Eo,0)
-        Y  = Eo - xo
-        mu = mean(E,0)
-        A  = E-mu
-        # Update j-th component of observed ensemble:
-        # ------------------------------------------------------
-        Y_j    = Rm12[j,:] @ Y.T
-        dy_j   = Rm12[j,:] @ (y - xo)
-        # Prior var * N1:
-        sig2_j = Y_j@Y_j                
-        if sig2_j<1e-9: continue
-        # Update (below, we drop the locality subscript: _j)
-        sig2_u = 1/( 1/sig2_j + 1/N1 )   # KG * N1
-        alpha  = (N1/(N1+sig2_j))**(0.5) # Update contraction factor
-        dy2    = sig2_u * dy_j/N1        # Mean update
-        Y2     = alpha*Y_j               # Anomaly update
-        # Without localization:
-        Regression = A.T @ Y_j/np.sum(Y_j**2)
-        mu        += Regression*dy2
-        A         += np.outer(Y2 - Y_j, Regression)
-
-    E = mu + infl*A
-    return E
+upd_method = "svd" # or "etkf", "auto" (see corona.enkf.cost), or "pf"
+# For "pf": dispersion of the (daily deaths) negative binomial likelihood,
+# and parameter jitter (regularization).
+nb_disp   = 10.
+pf_jitter = 0.1
 
 
 
 ## Integrate
-EEf = np.full(tt.shape+E.shape, nan)
-EEa = np.full(tt.shape+E.shape, nan)
+# Record stats (and 60 members), rather than the full ensembles
+recf = Recorder(len(tt), *E.shape, n_members=60)
+reca = Recorder(len(tt), *E.shape, n_members=60)
+ESS = np.full(tt.shape, nan)
 
 nVar = len(variables)
-
-for k,t in enumerate(tt[:-1]):
+# Batched model (one parameter set per member)
+ens  = SEIR2Ensemble.from_kwargs(N, model)
+iPar = [ens.fields.index(k) for k in parameters]
+step = RKStepper(ens.dxdt, (N,nVar))
+
+# Resume from the checkpoint (of the last assimilated obs.), if valid.
+# Set ckpt_file = None to always start from scratch.
+ckpt_file = "da1_ckpt.npz"
+ckpt_meta = repr((model, N, sampling, upd_method, infl, tt[[0,-1]], len(tt)))
+recorders = dict(recf=recf, reca=reca)
+k0 = 0
+if ckpt_file and (ckpt := checkpoint.load(ckpt_file, yy, recorders, meta=ckpt_meta)):
+    k0, E = ckpt
+    print(f"Resuming from day {k0}.")
+ens.params[:,iPar] = E[:,nVar:]
+
+for k in range(k0, len(tt)-1):
+    t  = tt[k]
     dt = tt[k+1] - t
+    R_fatl_prev = E[:,i_obs].copy()
     # Variables:
-    E[:,:nVar] = rk4(model.dxdt, E[:,:nVar], t, dt)
+    step(E[:,:nVar], t, dt, out=E[:,:nVar])
     # For the params, the model is (as of now) Id.
 
     # Assimilate
-    EEf[k+1] = E
-    if k+1<len(yy):
-        E = analysis(E,yy[k+1])
+    recf(k+1, E)
+    if k+1<len(yy) and upd_method == "pf":
+        daily = nPop*(E[:,i_obs] - R_fatl_prev)
+        E, ESS[k+1] = pf.analysis(E, pf.nbinom_logpdf(yy[k+1], daily, nb_disp),
+                                  jitter=pf_jitter, cols=slice(nVar,None))
+    elif k+1<len(yy):
+        E = analysis(E, yy[k+1:k+2], R, Obs, infl, upd_method)
         # E.clip(min=1e-9)
-    EEa[k+1] = E
+    reca(k+1, E)
+    if ckpt_file and k+1 == len(yy)-1:
+        checkpoint.save(ckpt_file, k+1, E, yy, recorders, meta=ckpt_meta)
 
     # Write params
-    for i,param in enumerate(parameters):
-        setattr(model,param,E[:,i+nVar])
+    ens.params[:,iPar] = E[:,nVar:]
 
 
-EEf[...,:nVar] *= nPop
-EEa[...,:nVar] *= nPop
+recf.rescale(nPop, slice(None,nVar))
+reca.rescale(nPop, slice(None,nVar))
 
 ## Plot
 
 # Unpack
-state = NamedVars(*EEf.T[:,:60,:])
+state = NamedVars(*recf.members.T)
 
 # Plot
 fig, ax = freshfig(1)
@@ -0,0 +1,91 @@
+"""Parameter estimation with ES-MDA (see ``corona.enkf.esmda``).
+
+Unlike ``da1.py`` (one analysis per day), all of the obs. are assimilated at once,
+after each of a few batched forward runs over the whole window.
+"""
+
+## Imports
+from corona.utils import *
+from corona.maths import *
+from corona.model import *
+from corona.plotting import *
+from corona.enkf import esmda
+from corona.prior import Prior, iChi2
+from corona.obs import load as load_obs
+
+np.random.seed(3)
+
+## Time -- unit: days
+date0 = datetime(2020,2,26) # 1st confirmed case in Norway
+
+
+## Params
+model      = SEIR2(t_intervention=15,dt_intervention=30)
+variables  = model.Variables._fields
+parameters = ("Rep0", "Rep_intervention", "pDead", "pSevr")
+# Estimated: initial Infected, Exposed, and the parameters.
+unknowns   = ("Infected", "Exposed") + parameters
+
+# Population size
+nPop = 5.368e6
+
+
+## Prior ensemble
+_mean = array([1,10]) / nPop
+_corr = array([[1,.8],[.8,1]])
+_std  = _mean / 10
+prior = Prior(
+    marginals=dict(
+        Rep0             = iChi2(model.Rep0, 1.5**2),
+        Rep_intervention = iChi2(model.Rep_intervention, 0.7**2),
+        pDead            = iChi2(model.pDead),
+        pSevr            = iChi2(model.pSevr),
+    ),
+    gauss={("Infected", "Exposed"): (_mean, _std[:,None] * _corr * _std)},
+    constraints=[lambda x: (0 <= x["Infected"]) & (0 <= x["Exposed"])])
+
+# Ens size
+N = 300
+E0 = prior.sample(N)
+E0 = np.column_stack([E0[k] for k in unknowns])
+
+
+## Obs
+days, obs = load_obs("Norway.txt", date0)
+assert np.all(np.diff(days) == 1), "Some days are missing."
+# Daily deaths
+yy = np.diff(obs["deaths"][days >= 0], prepend=0)
+tt = arange(len(yy), dtype=float)
+# Obs error matrix (Poisson-like)
+R = np.diag(1 + yy)
+
+
+## Forward model: unknowns (N, len(unknowns)) -> daily deaths (N, len(yy))
+i_fatl = variables.index("R_fatl")
+def forward(E):
+    E   = E.clip(min=0)
+    kws = dict(zip(unknowns, E.T))
+    ens = SEIR2Ensemble.from_kwargs(len(E), model, **{k: kws[k] for k in parameters})
+    x0  = zeros((len(E), len(variables)))
+    x0[:,variables.index("Infected")] = kws["Infected"]
+    x0[:,variables.index("Exposed")]  = kws["Exposed"]
+    x0[:,variables.index("Susceptible")] = 1 - kws["Infected"] - kws["Exposed"]
+    # Independent members, so this could also be ``integrate_parallel(ens, x0, tt)``.
+    xx  = integrate(ens.dxdt_into, np.asfortranarray(x0), tt, inplace=True)
+    return nPop*np.diff(xx[...,i_fatl], axis=0, prepend=0).T
+
+
+## Assimilate
+Ea = esmda(E0, yy, R, forward, alphas=(4,4,4,4)).clip(min=0)
+
+for k, (prior, post) in enumerate(zip(E0.T, Ea.T)):
+    print(f"{unknowns[k]:>17}: {mean(prior):.3g} -> {mean(post):.3g} +/- {np.std(post):.2g}")
+
+
+## Plot
+fig, ax = mpl_tools.freshfig(1)
+ax.plot(tt, forward(E0).T, c="C0", alpha=.1, lw=1)
+ax.plot(tt, forward(Ea).T, c="C1", alpha=.1, lw=1)
+ax.plot(tt, yy, "k*", label="Obs")
+ax.set_ylabel("Daily deaths")
+ax.legend()
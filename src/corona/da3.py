@@ -0,0 +1,131 @@
+"""Assimilate the deaths of many countries at once.
+
+The ensembles of all of the countries are stacked: ``E`` has shape (nCountries, N, M).
+The forecast is then one ``SEIR2Ensemble`` run (of nCountries*N members),
+and the analysis one (batched) call.
+NB: time 0 is the first date of the data, for all countries.
+"""
+
+## Imports
+from corona.utils import *
+from corona.maths import *
+from corona.model import *
+from corona.plotting import *
+from corona.enkf import analysis
+from corona.prior import Prior, iChi2
+from corona.fetch import Fetcher
+
+np.random.seed(3)
+
+
+## Data (same sources and cache as dash1.py)
+def _c(c):
+    if c=="United States": return "US"
+    if c=="United Kingdom": return "UK"
+    return c
+
+covid19, pops = Fetcher(max_age=3600).json(
+    'https://pomber.github.io/covid19/timeseries.json',
+    'https://raw.githubusercontent.com/samayo/country-json/master/src/country-by-population.json')
+covid19   = {_c(k):v for k,v in covid19.items()}
+byCountry = {_c(d['country']): {"nPop":int(d['population'] or -1)} for d in pops}
+
+countries = [c for c in covid19 if byCountry.get(c, {}).get("nPop", -1) > 0]
+nPop      = array([byCountry[c]["nPop"] for c in countries], float)
+dates     = [d["date"] for d in covid19[countries[0]]]
+assert all([d["date"] for d in covid19[c]] == dates for c in countries), "Dates differ."
+
+# Cumulative deaths, (nDays, nCountries)
+yy = array([[d["deaths"] for d in covid19[c]] for c in countries], float).T
+
+
+## Time -- unit: days
+t_end = 365
+dt    = 1
+tt    = linspace(0 , t_end , int(t_end/dt)+1)
+
+
+## Params
+model      = SEIR2(t_intervention=15,dt_intervention=30)
+variables  = model.Variables._fields
+parameters = tuple(k for k in vars(model) if "t_inter" not in k)
+StateVector = namedtuple("Estimated", variables + parameters)
+
+
+## Init ensemble
+# Ens size (per country)
+N = 100
+C = len(countries)
+M = len(StateVector._fields)
+
+_mean = array([1,10]) # numbers (not fractions) of people
+_corr = array([[1,.8],[.8,1]])
+_std  = _mean / 10
+prior = Prior(
+    marginals=dict(
+        Rep0             = iChi2(model.Rep0, 1.5**2),
+        Rep_intervention = iChi2(model.Rep_intervention, 0.7**2),
+        pDead            = iChi2(model.pDead),
+        pSevr            = iChi2(model.pSevr),
+    ),
+    gauss={("Infected", "Exposed"): (_mean, _std[:,None] * _corr * _std)},
+    constraints=[
+        lambda x: x["pDead"] + x["pSevr"] < 1,
+        lambda x: (0 <= x["Infected"]) & (0 <= x["Exposed"]),
+    ])
+
+E = zeros((C, N, M))
+E[...,len(variables):] = [getattr(model,k) for k in parameters]
+for k, v in prior.sample(C*N).items():
+    E[...,StateVector._fields.index(k)] = v.reshape(C, N)
+E[...,[1,2]] /= nPop[:,None,None] # Exposed, Infected
+E[...,0] = 1 - E[...,1] - E[...,2]
+
+
+## Obs
+i_obs = StateVector._fields.index("R_fatl")
+def Obs(E):
+    "Cumulative deaths (numbers), of each country."
+    return nPop[:,None,None] * E[...,[i_obs]]
+
+infl = 1.
+
+
+## Integrate
+nVar = len(variables)
+flat = E.reshape(C*N, M) # view
+ens  = SEIR2Ensemble.from_kwargs(C*N, model)
+iPar = [ens.fields.index(k) for k in parameters]
+step = RKStepper(ens.dxdt, (C*N,nVar))
+ens.params[:,iPar] = flat[:,nVar:]
+
+# Ensemble means, (nTimes, nCountries, M)
+mu = np.full(tt.shape+(C,M), nan)
+mu[0] = mean(E, 1)
+
+with Timer(f"{C} countries x {N} members"):
+    for k,t in enumerate(tt[:-1]):
+        dt = tt[k+1] - t
+        step(flat[:,:nVar], t, dt, out=flat[:,:nVar])
+
+        # Assimilate -- all countries at once.
+        if k+1<len(yy):
+            y = yy[k+1][:,None]
+            R = (1 + y + (.1*y)**2)[...,None] # Poisson-like + 10% error
+            E[:] = analysis(E, y, R, Obs, infl).clip(min=0)
+        mu[k+1] = mean(E, 1)
+
+        # Write params
+        ens.params[:,iPar] = flat[:,nVar:]
+
+
+## Plot
+fig, ax = mpl_tools.freshfig(1)
+for c in ["Norway", "Sweden", "France", "UK", "US"]:
+    if c in countries:
+        i = countries.index(c)
+        ax.plot(tt, nPop[i]*mu[:,i,i_obs], label=c)
+        ax.plot(arange(len(yy)), yy[:,i], "k*", ms=3)
+ax.set_ylabel("Deaths")
+ax.legend()
+mpl_tools.add_log_toggler(ax)
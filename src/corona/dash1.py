@@ -4,36 +4,28 @@ from corona.maths import *
 from corona.model import *
 from corona.plotting import *
 
-import mpl_tools
-
 ## Download data
-import requests
-import requests_cache
-# Cache persitence/expiration
-from datetime import timedelta
-expire_after = timedelta(hours=1)
-
-def get_json(URL):
-    # from urllib.parse import urlparse
-    # shortened = urlparse(URL).netloc
-    import pathlib
-    shortened = pathlib.Path(URL).name
-    requests_cache.install_cache(shortened, expire_after=expire_after)
-    data = requests.get(URL)
-    source = "cache" if data.from_cache else "internet"
-    print(f"{shortened} from {source}.")
-    return data.json()
+from corona.fetch import Fetcher
+# Cache persitence/expiration: 1 hour (then revalidated)
+fetcher = Fetcher(max_age=3600)
 
 def _c(c):
     if c=="United States": return "US"
     if c=="United Kingdom": return "UK"
     return c
 
-covid19 = get_json('https://pomber.github.io/covid19/timeseries.json')
+# Both sources at once
+covid19, pops = fetcher.json(
+    'https://pomber.github.io/covid19/timeseries.json',
+    'https://raw.githubusercontent.com/samayo/country-json/master/src/country-by-population.json')
 covid19 = {_c(k):v for k,v in covid19.items()}
 
+# Columnar store (memory-mapped). Only ingests the new days.
+from corona.feed import Store
+store = Store("covid19")
+store.refresh(covid19)
+
 # Population data
-pops = get_json('https://raw.githubusercontent.com/samayo/country-json/master/src/country-by-population.json')
 byCountry = {_c(d['country']): {"nPop":int(d['population'] or -1)} for d in pops}
 
 # As dict
@@ -41,14 +33,10 @@ byDate = {dct["date"]: {k:v for k,v in dct.items() if k!="date"}  for dct in cov
 # IPython.lib.pretty.pretty prints better than default, but this is still better:
 byDate = JsonDict(byDate)
 
-# As dataframes
+# As dataframe, with columns (country, field).
+# Built in one go; dfs[country] is a (no-copy) DataFrame.
 import pandas as pd
-def get_df(country):
-    d  = covid19[country]
-    df = pd.DataFrame.from_records(d)
-    df["date"] = pd.to_datetime(df["date"])
-    return df.set_index("date")
-dfs = {country: get_df(country) for country in covid19}
+dfs = store.frame()
 
 # Examples
 # df = dfs["Norway"]
@@ -90,13 +78,20 @@ mpl_tools.add_log_toggler(ax)
 ## 
 fig, ax = mpl_tools.freshfig(3)
 deaths_intercept = 1 / 10**6 # death (density) for which lines should intersect
+
+# Lags (date offsets) of all countries (with nPop), for a range of intercepts
+withPop = [c for c in store.countries if byCountry.get(c, {}).get("nPop", -1) > 0]
+nPops   = array([byCountry[c]["nPop"] for c in withPop], float)
+cDeath  = store["deaths"][:, [store.countries.index(c) for c in withPop]] / nPops
+intercepts = deaths_intercept * array([.1, .3, 1, 3, 10])
+lag_table  = pd.DataFrame(lags(cDeath, intercepts), index=withPop, columns=intercepts)
+
 for c in countries:
     # Compute death density
-    nPop = byCountry[c]["nPop"]
-    deaths = dfs[c]["deaths"].to_numpy()/nPop
-    # Compute date offset
+    deaths = cDeath[:, withPop.index(c)]
+    # Get date offset
     day_range = arange(len(deaths))
-    nDay = np.interp(deaths_intercept, deaths, day_range)
+    nDay = lag_table.loc[c, deaths_intercept]
     # Plot with offset
     ax.plot(day_range - nDay, deaths, label=c)
     # Store offset
@@ -0,0 +1,119 @@
+"""Ensemble Kalman filter (EnKF) analysis.
+
+Ensembles ``E`` have shape (..., N, M): N members of M state variables
+(e.g. the variables and parameters of ``da1.StateVector``).
+Any leading dimensions are batch dimensions (separate filters).
+"""
+from corona.maths import *
+
+
+def _T(X):
+    return np.swapaxes(X, -1, -2)
+
+
+def Rm12(R):
+    "Inverse (symmetric) square root of the obs. error covariance R."
+    d, V = nla.eigh(R)
+    return (V * d[..., None, :]**-0.5) @ _T(V)
+
+
+def cost(method, N, p, M):
+    """Leading-order flop count of ``analysis`` (excl. ``Obs``), for a given ``method``.
+
+    - ``"svd"`` : thin SVD of the (N, p) obs. anomalies:  N p r + 2 N M r,  r = min(N, p).
+    - ``"etkf"``: eigh of the (N, N) ensemble-space matrix: N^2 p + N^3 + N^2 M.
+
+    ``"auto"`` resolves to the cheaper of the two.
+    """
+    costs = dict(svd=N*p*min(N, p) + 2*N*M*min(N, p),
+                 etkf=N**2*p + N**3 + N**2*M)
+    if method == "auto":
+        method = min(costs, key=costs.get)
+    return method, costs[method]
+
+
+def analysis(E, y, R, Obs, infl=1.0, method="svd"):
+    """Deterministic (square-root) EnKF analysis of ``E`` given the obs. ``y`` (..., p).
+
+    - ``Obs``: observation operator, ``Obs(E)`` has shape (..., N, p).
+    - ``R``  : obs. error covariance (p, p), possibly correlated, or batched (..., p, p).
+
+    All of the obs. are processed at once.
+    With the whitened obs. anomalies ``Y = (Obs(E) - mean) @ R^{-1/2}``,
+    and ``A`` the state anomalies, the update is:
+
+    - mean:      ``mu += A.T @ Y @ inv(Y.T @ Y + (N-1) I) @ dy``,
+    - anomalies: ``A  <- (I + Y @ Y.T / (N-1))^{-1/2} @ A``,
+
+    both computed via the thin SVD of Y, for a cost of O(N p r + N M r),
+    with ``r = min(N, p)``. So p > N is fine.
+    For a scalar obs. this reduces to the serial update formerly in ``da1.py``.
+
+    With ``method="etkf"``, the same update is computed as an ensemble-transform
+    Kalman filter, with all of the algebra in the (N, N) ensemble space
+    (eigh of ``Y @ Y.T + (N-1) I``). See ``cost`` for the cost of each method.
+    """
+    N1 = E.shape[-2] - 1
+    W  = Rm12(R)
+    Eo = Obs(E)
+    xo = mean(Eo, -2, keepdims=True)
+    Y  = (Eo - xo) @ _T(W)
+    dy = (W @ (y - xo[..., 0, :])[..., None])[..., 0]
+    mu = mean(E, -2, keepdims=True)
+    A  = E - mu
+
+    method, _ = cost(method, E.shape[-2], Y.shape[-1], E.shape[-1])
+    if method == "etkf":
+        return _etkf(mu, A, Y, dy, N1, infl)
+    elif method != "svd":
+        raise ValueError(f"Unknown method: {method!r}.")
+
+    U, s, VT = nla.svd(Y, full_matrices=False)
+    s2 = s**2
+    # As in the serial version: skip components with (nearly) no spread.
+    ok = s2 >= 1e-9
+
+    # Mean update -- as ensemble weights
+    c   = np.where(ok, s/(s2 + N1), 0)
+    w   = U @ (c * (VT @ dy[..., None])[..., 0])[..., None]
+    mu += _T(w) @ A
+
+    # Anomaly update -- symmetric square root of the transform
+    d   = np.where(ok, (1 + s2/N1)**(-1/2) - 1, 0)
+    A  += U @ (d[..., None] * (_T(U) @ A))
+
+    return mu + infl*A
+
+
+def _etkf(mu, A, Y, dy, N1, infl):
+    "The ETKF version of ``analysis`` (ensemble-space algebra)."
+    lmbda, V = nla.eigh(Y @ _T(Y) + N1*eye(Y.shape[-2]))
+    # As in "svd": skip components with (nearly) no spread.
+    ok = lmbda - N1 >= 1e-9
+    # Mean update -- as ensemble weights
+    c   = np.where(ok, 1/lmbda, 0)
+    w   = V @ (c[..., None] * (_T(V) @ (Y @ dy[..., None])))
+    mu += _T(w) @ A
+    # Transform matrix: T = sqrt(N1) * (Y Y^T + N1 I)^{-1/2}
+    d   = np.where(ok, sqrt(N1/lmbda), 1)
+    T   = (V * d[..., None, :]) @ _T(V)
+    return mu + infl*(T @ A)
+
+
+def esmda(E, y, R, forward, alphas=(4, 4, 4, 4), infl=1.0, method="svd"):
+    """Ensemble smoother with multiple data assimilation (ES-MDA).
+
+    - ``E``: ensemble (N, M) of the static unknowns (parameters, initial conditions).
+    - ``y``: all of the obs. (p,) of the window, with error covariance ``R`` (p, p).
+    - ``forward(E)``: the predicted obs. (N, p), e.g. by one batched model run
+      over the whole window.
+
+    Each of the ``alphas`` iterations is one ``forward`` run followed by
+    one ``analysis`` with ``R`` inflated by alpha, which should satisfy
+    ``sum(1/alphas) == 1``. For a linear ``forward`` this equals a single analysis.
+    """
+    if not np.isclose(sum(1/a for a in alphas), 1):
+        raise ValueError(f"Require sum(1/alphas) == 1, not {sum(1/a for a in alphas)}.")
+    for alpha in alphas:
+        E = analysis(E, y, alpha*R, forward, infl, method)
+    return E
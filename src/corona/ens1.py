@@ -6,6 +6,7 @@ from corona.utils import *
 from corona.maths import *
 from corona.model import *
 from corona.plotting import *
+from corona.prior import Prior
 
 ## Params
 model = SEIR2(t_intervention=100)
@@ -23,7 +24,9 @@ date0 = datetime(2020,2,12)
 ## Init ensemble
 x0 = model.init_state(Infected=1/nPop)
 E0 = x0 + zeros((N,len(x0)))
-E0[:,model.Variables._fields.index("Infected")] = .1/nPop * randn(N)
+sampling = "mc" # or "sobol", "halton", "lhs" (quasi-random: smaller N suffices)
+prior = Prior(gauss={("Infected",): ([0], [[(.1/nPop)**2]])})
+E0[:,model.Variables._fields.index("Infected")] = prior.sample(N, method=sampling)["Infected"]
 E0 = E0.clip(min=1e-9)
 
 ## Integrate
@@ -32,6 +32,7 @@ date0 = datetime(2020,2,12)
 x0 = model.init_state(Infected=1/nPop)
 # xx = scipy.integrate.odeint(model.dxdt, x0, tt)
 xx = integrate(model.dxdt, x0, tt)
+# xx, nfev = integrate_adaptive(model.dxdt, x0, tt, tstops=model.t_switches)
 
 # Multiply by population
 xx = nPop * xx
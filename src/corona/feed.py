@@ -0,0 +1,138 @@
+"""Local columnar store of the covid19 time series feed.
+
+The feed (https://pomber.github.io/covid19/timeseries.json) maps each country
+to a list of daily records (date, confirmed, deaths, recovered).
+
+In the store, each field is one raw (float64) file, day-major,
+i.e. of shape (nDays, nCountries), so that a refresh only (re)writes the days
+from the first new (or revised) one, and loading is a ``np.memmap``.
+The countries and dates are in ``meta.json``.
+
+Example::
+
+  store = Store("covid19")
+  store.refresh(covid19) # parsed JSON
+  store["deaths"][:, store.countries.index("Norway")]
+  store.frame()["Norway"]
+"""
+import json
+
+from corona.utils import *
+from corona.maths import *
+
+FIELDS = ("confirmed", "deaths", "recovered")
+
+
+def _date(s):
+    "Parse the dates of the feed, e.g. '2020-1-22'."
+    y, m, d = map(int, s.split("-"))
+    return np.datetime64(f"{y:04d}-{m:02d}-{d:02d}", "D")
+
+
+class Store:
+    "Columnar store (in the directory ``root``). See module doc."
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._read_meta()
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    def _read_meta(self):
+        try:
+            with open(self._path("meta.json")) as F:
+                self.meta = json.load(F)
+        except FileNotFoundError:
+            self._reset([], None)
+
+    def _reset(self, countries, date0):
+        self.meta = dict(countries=countries, date0=str(date0), nDays=0)
+        self._write_meta()
+        for f in FIELDS:
+            if os.path.exists(self._path(f)):
+                os.remove(self._path(f))
+
+    def _write_meta(self):
+        tmp = self._path("meta.json.tmp")
+        with open(tmp, "w") as F:
+            json.dump(self.meta, F)
+        os.replace(tmp, self._path("meta.json"))
+
+    @property
+    def countries(self):
+        return self.meta["countries"]
+
+    @property
+    def dates(self):
+        return np.datetime64(self.meta["date0"], "D") + arange(self.meta["nDays"])
+
+    def __getitem__(self, field):
+        "Read-only memory map of ``field``, of shape (nDays, nCountries)."
+        shape = (self.meta["nDays"], len(self.countries))
+        if not all(shape):
+            return zeros(shape)
+        return np.memmap(self._path(field), float, "r", shape=shape)
+
+    def country(self, name):
+        "Dict of the series (views, no copy) of the country ``name``."
+        i = self.countries.index(name)
+        return {f: self[f][:, i] for f in FIELDS}
+
+    def block(self, fields=FIELDS):
+        "All of the data, in one array of shape (nDays, nCountries, nFields)."
+        return np.stack([self[f] for f in fields], axis=-1)
+
+    def frame(self, fields=FIELDS):
+        """All of the data, in one DataFrame, indexed by date,
+        with columns (country, field), and backed by ``block``.
+
+        Hence ``frame[country]`` is the (no-copy) DataFrame of one country.
+        """
+        B = self.block(fields)
+        columns = pd.MultiIndex.from_product([self.countries, fields], names=["country", "field"])
+        index   = pd.DatetimeIndex(self.dates, name="date")
+        return pd.DataFrame(B.reshape(len(B), -1), index=index, columns=columns, copy=False)
+
+    def refresh(self, feed):
+        """Ingest the (parsed JSON) ``feed``, (re)writing from its first new or revised day.
+
+        Returns the number of days written.
+        If the feed has other countries, or starts at another date, the store is rebuilt.
+        """
+        countries = list(feed)
+        nDays     = len(feed[countries[0]])
+        date0     = _date(feed[countries[0]][0]["date"])
+        assert all(len(feed[c]) == nDays for c in countries), "Countries have different dates."
+        assert _date(feed[countries[0]][-1]["date"]) == date0 + nDays - 1, "Some days are missing."
+        self._read_meta() # In case of other writers
+        if countries != self.countries or str(date0) != self.meta["date0"]:
+            self._reset(countries, date0)
+
+        data = {f: array([[nan if r[f] is None else r[f] for r in feed[c]] for c in countries], float).T
+                for f in FIELDS}
+
+        # Find the first revised day (upstream may correct past counts)
+        k0 = min(self.meta["nDays"], nDays)
+        for f in FIELDS:
+            old, new = self[f][:k0], data[f][:k0]
+            same = (old == new) | (np.isnan(old) & np.isnan(new))
+            changed = np.flatnonzero(~same.all(1))
+            if len(changed):
+                k0 = int(changed[0])
+        if k0 == nDays == self.meta["nDays"]:
+            return 0
+
+        if k0 < self.meta["nDays"]:
+            self.meta["nDays"] = k0
+            self._write_meta() # Before truncating, so that the stored data is always valid.
+        nBytes = k0 * len(countries) * 8
+        for f in FIELDS:
+            with open(self._path(f), "r+b" if os.path.exists(self._path(f)) else "wb") as F:
+                F.truncate(nBytes) # Also in case of an interrupted refresh
+                F.seek(nBytes)
+                F.write(data[f][k0:].tobytes())
+        self.meta["nDays"] = nDays
+        self._write_meta() # Last, so that the stored data is always valid.
+        return nDays - k0
@@ -0,0 +1,95 @@
+"""Fetching of data sources (URLs): concurrently, over one pooled HTTP session.
+
+The responses are kept in a (single) disk cache. Entries older than ``max_age``
+are revalidated with conditional requests (ETag/Last-Modified),
+so that unchanged sources are not downloaded again.
+
+Example::
+
+  covid19, pops = Fetcher().json(URL1, URL2)
+"""
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from corona.utils import *
+
+
+class Fetcher:
+    "See module doc. ``max_age``: seconds."
+
+    def __init__(self, cache_dir="http_cache", max_age=3600, nthreads=8, timeout=60, verbose=True):
+        self.cache_dir = cache_dir
+        self.max_age   = max_age
+        self.nthreads  = nthreads
+        self.timeout   = timeout
+        self.verbose   = verbose
+        os.makedirs(cache_dir, exist_ok=True)
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=nthreads, pool_maxsize=nthreads)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode()).hexdigest())
+
+    def _write(self, path, meta, body=None):
+        if body is not None:
+            with open(path + ".tmp", "wb") as F:
+                F.write(body)
+            os.replace(path + ".tmp", path)
+        with open(path + ".json.tmp", "w") as F:
+            json.dump(meta, F)
+        os.replace(path + ".json.tmp", path + ".json")
+
+    def get(self, url):
+        "The content (bytes) of ``url``, from the cache if fresh (or not modified)."
+        path = self._path(url)
+        body = None
+        try:
+            with open(path + ".json") as F:
+                meta = json.load(F)
+        except FileNotFoundError:
+            meta = None
+        if not os.path.exists(path):
+            meta = None
+
+        if meta and time.time() - meta["time"] < self.max_age:
+            source = "cache"
+        else:
+            headers = {}
+            if meta and meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta and meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+            r = self.session.get(url, headers=headers, timeout=self.timeout)
+            if meta and r.status_code == 304:
+                source = "cache (not modified)"
+                meta["time"] = time.time()
+                self._write(path, meta)
+            else:
+                r.raise_for_status()
+                source = "internet"
+                meta = dict(url=url, time=time.time(),
+                            etag=r.headers.get("ETag"),
+                            last_modified=r.headers.get("Last-Modified"))
+                body = r.content
+                self._write(path, meta, body)
+
+        if self.verbose:
+            print(f"{os.path.basename(url)} from {source}.")
+        if body is None:
+            with open(path, "rb") as F:
+                body = F.read()
+        return body
+
+    def fetch(self, *urls):
+        "``get`` all of the ``urls`` concurrently. Returns a list of the contents."
+        with ThreadPoolExecutor(min(self.nthreads, len(urls))) as pool:
+            return list(pool.map(self.get, urls))
+
+    def json(self, *urls):
+        "Same as ``fetch``, but parsed as JSON."
+        return [json.loads(body) for body in self.fetch(*urls)]
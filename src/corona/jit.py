@@ -0,0 +1,118 @@
+"""Optional compiled backend (numba) for integrating SEIR2 with RK4.
+
+The RHS and the whole time loop (over members and steps) are compiled.
+Select the backend at runtime, per call or by setting ``corona.jit.backend``.
+If numba is not installed, the default is the pure-numpy path
+(``integrate(model.dxdt_into, ..., inplace=True)``).
+"""
+from corona.maths import *
+from corona.model import SEIR2Ensemble
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+backends = ("numba", "numpy")
+backend  = "numba" if numba else "numpy"
+
+
+def _jit(func):
+    if numba is None:
+        return func
+    return numba.njit(cache=True)(func)
+
+
+@_jit
+def _dxdt(x, p, t, out):
+    """SEIR2.dxdt for a single state ``x``, with params ``p``
+    (ordered as ``SEIR2Ensemble.fields``). Same operations as SEIR2.dxdt."""
+    Rep0, t_intervention, dt_intervention, Rep_intervention = p[0], p[1], p[2], p[3]
+    dt_E, dt_I, pDead, pSevr = p[4], p[5], p[6], p[7]
+    dt_Q_mild, dt_Q_fatl, dt_Q_sevr, dt_H = p[8], p[9], p[10], p[11]
+    pMild = 1 - pSevr - pDead
+
+    if t_intervention < t < (t_intervention+dt_intervention):
+        beta = Rep_intervention
+    else:
+        beta = Rep0
+
+    S2E = x[0] * x[2] / dt_I * beta
+    E2I = x[1]        / dt_E
+    I2Q = x[2]        / dt_I
+
+    Q2R_mild = x[3] / dt_Q_mild
+    Q2R_fatl = x[6] / dt_Q_fatl
+    Q2H      = x[4] / dt_Q_sevr
+    H2R      = x[5] / dt_H
+
+    out[0] = -S2E
+    out[1] = +S2E - E2I
+    out[2] = -I2Q + E2I
+    out[3] = -Q2R_mild + pMild*I2Q
+    out[4] = -Q2H      + pSevr*I2Q
+    out[5] = +Q2H      - H2R
+    out[6] = -Q2R_fatl + pDead*I2Q
+    out[7] = +Q2R_mild
+    out[8] = +H2R
+    out[9] = +Q2R_fatl
+
+
+@_jit
+def _rk4_loop(xx, P, tt):
+    """RK4 over ``tt`` for each member, in place in ``xx`` (nT, N, nVar).
+
+    ``P`` holds the params of each member, or a single row (shared).
+    The stages are combined as in ``rk4``."""
+    nT, N, nVar = xx.shape
+    stages = np.empty((5, nVar))
+    k1, k2, k3, k4, tmp = stages[0], stages[1], stages[2], stages[3], stages[4]
+    for n in range(N):
+        p = P[min(n, len(P)-1)]
+        for k in range(nT-1):
+            t  = tt[k]
+            dt = tt[k+1] - t
+            x  = xx[k, n]
+
+            _dxdt(x, p, t, k1)
+            for i in range(nVar):
+                k1[i] = dt * k1[i]
+                tmp[i] = x[i] + k1[i]/2
+            _dxdt(tmp, p, t+dt/2, k2)
+            for i in range(nVar):
+                k2[i] = dt * k2[i]
+                tmp[i] = x[i] + k2[i]/2
+            _dxdt(tmp, p, t+dt/2, k3)
+            for i in range(nVar):
+                k3[i] = dt * k3[i]
+                tmp[i] = x[i] + k3[i]
+            _dxdt(tmp, p, t+dt, k4)
+            for i in range(nVar):
+                k4[i] = dt * k4[i]
+                xx[k+1, n, i] = x[i] + (k1[i] + 2*(k2[i] + k3[i]) + k4[i])/6
+
+
+def integrate_seir2(model, x0, tt, backend=None):
+    """Same as ``integrate(model.dxdt, x0, tt)``, using the selected backend.
+
+    - ``model``: a SEIR2 or (if ``x0`` has shape (N, nVars)) a SEIR2Ensemble.
+    - ``backend``: one of ``backends``. Defaults to ``corona.jit.backend``.
+    """
+    backend = backend or globals()["backend"]
+    if backend not in backends:
+        raise ValueError(f"backend must be one of {backends}, not {backend!r}.")
+
+    if backend == "numpy":
+        return integrate(model.dxdt_into, x0, tt, inplace=True)
+
+    if numba is None:
+        raise ImportError("The numba backend requires numba to be installed.")
+    x0 = asarray(x0, dtype=float)
+    if isinstance(model, SEIR2Ensemble):
+        P = np.ascontiguousarray(model.params)
+    else:
+        P = array([[getattr(model, k) for k in SEIR2Ensemble.fields]], dtype=float)
+    xx = zeros(tt.shape + x0.shape)
+    xx[0] = x0
+    _rk4_loop(xx.reshape(len(tt), -1, x0.shape[-1]), P, asarray(tt, dtype=float))
+    return xx
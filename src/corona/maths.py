@@ -2,15 +2,21 @@
 """
 
 import numpy as np
-import scipy as sp
-import scipy.linalg as sla
 import numpy.linalg as nla
-import scipy.stats as ss
 
-from scipy.linalg import svd
+from corona.utils import LazyModule
+
+# scipy is slow to import, so only load it when used.
+sp  = LazyModule("scipy")
+sla = LazyModule("scipy.linalg")
+ss  = LazyModule("scipy.stats")
+
+def svd  (*args, **kwargs): return sla.svd  (*args, **kwargs)
+def sqrtm(*args, **kwargs): return sla.sqrtm(*args, **kwargs)
+def inv  (*args, **kwargs): return sla.inv  (*args, **kwargs)
+def eigh (*args, **kwargs): return sla.eigh (*args, **kwargs)
 from numpy.linalg import eig
 # eig() of scipy.linalg necessitates using np.real_if_close().
-from scipy.linalg import sqrtm, inv, eigh
 
 from numpy import \
     pi, nan, \
@@ -46,16 +52,285 @@ def rk4(f, x, t, dt, order=4):
     else: raise NotImplementedError
 
 
-def integrate(f, x0, tt):
-    "Integrate f(x,t) over tt."
+class RKStepper:
+    """Same as ``rk4``, but with the stage buffers allocated once (and reused).
+
+    If ``inplace``, then ``f`` is called as ``f(x, t, out)``
+    (e.g. ``SEIR2.dxdt_into``), and no temporaries are created at all.
+    Otherwise ``f(x, t)`` is used, and only its return values are allocated.
+
+    The stages are combined in the same order as ``rk4``,
+    so that the results are bit-identical.
+    """
+    def __init__(self, f, shape, dtype=float, order=4, inplace=False, layout="C"):
+        if order not in [1, 2, 3, 4]:
+            raise NotImplementedError
+        self.f       = f
+        self.order   = order
+        self.inplace = inplace
+        buffer       = lambda: np.empty(shape, dtype, order=layout)
+        self.k       = [buffer() for _ in range(order)]
+        self.tmp     = buffer()
+
+    def _stage(self, k, x, t, dt):
+        "Write ``dt * f(x, t)`` to ``k``."
+        if self.inplace:
+            self.f(x, t, k)
+            np.multiply(k, dt, out=k)
+        else:
+            np.multiply(self.f(x, t), dt, out=k)
+
+    def __call__(self, x, t, dt, out=None):
+        """Step from ``x`` at ``t`` to ``t+dt``. Return ``out`` (may be ``x``)."""
+        if out is None:
+            out = np.empty_like(x)
+        k, tmp = self.k, self.tmp
+        order  = self.order
+
+        if order >=1:
+            self._stage(k[0], x, t, dt)
+        if order >=2:
+            np.divide(k[0], 2, out=tmp); np.add(tmp, x, out=tmp)
+            self._stage(k[1], tmp, t+dt/2, dt)
+        if order ==3:
+            np.multiply(k[1], 2, out=tmp); np.add(tmp, x, out=tmp)
+            np.subtract(tmp, k[0], out=tmp)
+            self._stage(k[2], tmp, t+dt, dt)
+        if order ==4:
+            np.divide(k[1], 2, out=tmp); np.add(tmp, x, out=tmp)
+            self._stage(k[2], tmp, t+dt/2, dt)
+            np.add(x, k[2], out=tmp)
+            self._stage(k[3], tmp, t+dt, dt)
+
+        if order ==1:
+            return np.add(x, k[0], out=out)
+        elif order ==2:
+            return np.add(x, k[1], out=out)
+        elif order ==3:
+            np.multiply(k[1], 4, out=tmp)
+            np.add(k[0], tmp, out=tmp)
+            np.add(tmp, k[2], out=tmp)
+        elif order ==4:
+            np.add(k[1], k[2], out=tmp)
+            np.multiply(tmp, 2, out=tmp)
+            np.add(k[0], tmp, out=tmp)
+            np.add(tmp, k[3], out=tmp)
+        np.divide(tmp, 6, out=tmp)
+        return np.add(x, tmp, out=out)
+
+
+def _layout(x0):
+    return "F" if (x0.ndim>1 and np.isfortran(x0)) else "C"
+
+
+def _iterate(f, x0, tt, order=4, inplace=False):
+    """Yield ``(k, x)``, with x the state at ``tt[k]``.
+
+    Only two states are held: x is a buffer that is overwritten two steps later.
+    """
+    x    = np.array(x0, dtype=float, order=_layout(x0))
+    x1   = np.empty_like(x)
+    step = RKStepper(f, x.shape, x.dtype, order, inplace, _layout(x))
+    yield 0, x
+    for k,t in enumerate(tt[:-1]):
+        dt = tt[k+1] - t
+        step(x, t, dt, out=x1)
+        x, x1 = x1, x
+        yield k+1, x
+
+
+def integrate_iter(f, x0, tt, every=1, order=4, inplace=False):
+    """Generator version of ``integrate``: yield ``(t, x)`` at every ``every``-th t in tt.
+
+    Memory use does not depend on ``len(tt)``, e.g.::
+
+      for t, x in integrate_iter(model.dxdt, x0, tt, every=10):
+          plot(t, x)
+    """
+    for k, x in _iterate(f, x0, tt, order, inplace):
+        if k % every == 0:
+            yield tt[k], x.copy()
+
+
+def integrate(f, x0, tt, order=4, inplace=False, save_every=1, save_at=None, out=None):
+    """Integrate f(x,t) over tt.
+
+    Uses an ``RKStepper``, so that no memory is allocated per step
+    (with ``inplace``, see ``RKStepper``).
+    If ``x0`` is column-major (Fortran), then so is each ``xx[k]``.
+
+    Only the states at ``tt[::save_every]``, or at the (increasing) times ``save_at``
+    (which must be in tt) are stored and returned, e.g.
+    ``save_at=tt[-1:]`` returns the final state only.
+    Stepping stops at the last of these (so ``save_at=[]`` returns an empty array).
+
+    ``out``: array to write the result to (e.g. a view of shared memory).
+    """
+    x0 = asarray(x0, dtype=float)
+    if save_at is None:
+        kk = arange(0, len(tt), save_every)
+    else:
+        kk = np.searchsorted(tt, save_at)
+        if np.any(kk >= len(tt)) or np.any(tt[kk.clip(max=len(tt)-1)] != save_at):
+            raise ValueError("save_at must be a subset of tt.")
+
+    if out is not None:
+        xx = out
+    elif _layout(x0) == "F":
+        # Store time first, but with each xx[k] column-major.
+        xx = zeros(kk.shape+x0.shape[::-1]).transpose(0, *range(x0.ndim, 0, -1))
+    else:
+        xx = zeros(kk.shape+x0.shape)
+
+    if len(kk) == 0:
+        return xx
+    if len(kk) == len(tt):
+        # Step directly into xx (same as ``_iterate``, without copying).
+        xx[0] = x0
+        step  = RKStepper(f, x0.shape, xx.dtype, order, inplace, _layout(x0))
+        for k,t in enumerate(tt[:-1]):
+            dt = tt[k+1] - t
+            step(xx[k], t, dt, out=xx[k+1])
+        return xx
+
+    j = 0
+    for k, x in _iterate(f, x0, tt[:kk[-1]+1], order, inplace):
+        while j < len(kk) and kk[j] == k:
+            xx[j] = x
+            j += 1
+    return xx
+
+
+def ros2(f, jac, x, t, dt):
+    """Rosenbrock (linearly implicit) ROS2 solver. 2nd order, L-stable.
+
+    For stiff problems, where the explicit ``rk4`` would need a tiny ``dt``.
+    ``jac(x, t)`` is the Jacobian of ``f``, of shape ``x.shape+(n,)``,
+    so ``x`` may be a batch of states (..., n), whose linear systems
+    are then solved all at once.
+
+    Ref: Verwer, Spee, Blom, Hundsdorfer (1999), SIAM J. Sci. Comput.
+    """
+    gamma = 1 + 1/sqrt(2)
+    W     = eye(x.shape[-1]) - gamma*dt*jac(x, t)
+    solve = lambda b: nla.solve(W, b[..., None])[..., 0]
+    k1    = solve(f(x, t))
+    k2    = solve(f(x + dt*k1, t+dt) - 2*k1)
+    return x + dt*(3/2*k1 + 1/2*k2)
+
+
+def integrate_stiff(f, jac, x0, tt):
+    "Integrate f(x,t) over tt with ``ros2``."
     xx = zeros(tt.shape+x0.shape)
     xx[0] = x0
     for k,t in enumerate(tt[:-1]):
         dt = tt[k+1] - t
-        xx[k+1] = rk4(f, xx[k], t, dt)
+        xx[k+1] = ros2(f, jac, xx[k], t, dt)
     return xx
 
 
+# Dormand-Prince 5(4) tableau, with the 4th-order dense output of Hairer
+# (the coefficients are those of scipy.integrate.RK45).
+_DP_C = array([0, 1/5, 3/10, 4/5, 8/9, 1])
+_DP_A = [
+    [],
+    [1/5],
+    [3/40, 9/40],
+    [44/45, -56/15, 32/9],
+    [19372/6561, -25360/2187, 64448/6561, -212/729],
+    [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656],
+    [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84], # = B (FSAL)
+]
+_DP_E = array([-71/57600, 0, 71/16695, -71/1920, 17253/339200, -22/525, 1/40])
+_DP_P = array([
+    [1, -8048581381/2820520608, 8663915743/2820520608, -12715105075/11282082432],
+    [0, 0, 0, 0],
+    [0, 131558114200/32700410799, -68118460800/10900136933, 87487479700/32700410799],
+    [0, -1754552775/470086768, 14199869525/1410260304, -10690763975/1880347072],
+    [0, 127303824393/49829197408, -318862633887/49829197408, 701980252875/199316789632],
+    [0, -282668133/205662961, 2019193451/616988883, -1453857185/822651844],
+    [0, 40617522/29380423, -110615467/29380423, 69997945/29380423]])
+
+
+def integrate_adaptive(f, x0, tt, rtol=1e-6, atol=1e-12, tstops=(), h0=None):
+    """Integrate f(x,t) over tt with adaptive Dormand-Prince 5(4).
+
+    Steps are chosen by error control, and the output at ``tt``
+    is obtained by dense (interpolated) output.
+
+    ``tstops`` are times at which ``f`` is discontinuous in ``t``.
+    No step crosses them, and ``f`` is evaluated with ``t`` clipped to
+    the inside of the current segment, so that the switch is resolved exactly.
+
+    Returns ``xx, nfev``, where nfev is the number of evaluations of ``f``.
+    """
+    x  = asarray(x0, dtype=float)
+    xx = zeros(tt.shape+x.shape)
+    xx[0] = x
+
+    def norm(dx, scale):
+        return sqrt(mean((dx/scale)**2))
+
+    edges = [tt[0]] + sorted(s for s in set(tstops) if tt[0] < s < tt[-1]) + [tt[-1]]
+    K     = zeros((7,)+x.shape)
+    nfev  = 0
+    i     = 1  # index of next output
+    h     = h0
+
+    for a, b in zip(edges[:-1], edges[1:]):
+        # Evaluate f with t strictly inside (a,b).
+        lo, hi = np.nextafter(a, b), np.nextafter(b, a)
+        def g(x, t):
+            return f(x, min(max(t, lo), hi))
+
+        K[0] = g(x, a)
+        nfev += 1
+
+        if h is None:
+            # Initial step size (Hairer, Nørsett, Wanner, Sec. II.4)
+            scale = atol + rtol*abs(x)
+            d0, d1 = norm(x, scale), norm(K[0], scale)
+            h = 1e-6 if min(d0, d1) < 1e-5 else 0.01*d0/d1
+            d2 = norm(g(x + h*K[0], a+h) - K[0], scale) / h
+            nfev += 1
+            h1 = max(1e-6, h*1e-3) if max(d1, d2) <= 1e-15 else (0.01/max(d1, d2))**(1/5)
+            h = min(100*h, h1)
+
+        t = a
+        while t < b:
+            last = h >= b - t
+            if last:
+                h = b - t
+            # Stages
+            for s in range(1, 6):
+                dx   = np.tensordot(_DP_A[s], K[:s], 1)
+                K[s] = g(x + h*dx, t + _DP_C[s]*h)
+            x1   = x + h*np.tensordot(_DP_A[6], K[:6], 1)
+            K[6] = g(x1, t + h)
+            nfev += 6
+
+            # Error control
+            scale = atol + rtol*np.maximum(abs(x), abs(x1))
+            err   = norm(h*np.tensordot(_DP_E, K, 1), scale)
+            if err > 1:
+                h *= max(0.2, 0.9*err**(-1/5))
+                continue
+            t1 = b if last else t + h
+
+            # Dense output
+            Q = np.tensordot(_DP_P.T, K, 1)
+            while i < len(tt) and tt[i] <= t1:
+                theta = (tt[i] - t)/h
+                xx[i] = x + h*np.tensordot(theta**arange(1, 5), Q, 1)
+                i += 1
+
+            t, x = t1, x1
+            K[0] = K[6]
+            h *= min(10, max(0.2, 0.9*err**(-1/5))) if err > 0 else 10
+
+    return xx, nfev
+
+
 def round2sigfig(num,nfig=1):
     """Round number to significant figures"""
 
@@ -69,3 +344,39 @@ def round2sigfig(num,nfig=1):
     nfig =nfig-1
     n    = nfig + ndecimal(num)
     return np.round(num, n) # n specified => float (always)
+
+
+def lags(xx, levels):
+    """Times (fractional indices) at which each series reaches each of the ``levels``.
+
+    - ``xx``: series (nTimes, nSeries), e.g. cumulative deaths per capita by country.
+      Made monotone (running max), as needed. NaNs are forward-filled,
+      but a series that starts with NaN gets NaN lags.
+    - ``levels``: (nLevels,).
+
+    Returns (nSeries, nLevels). Column ``j`` of row ``i`` equals
+    ``np.interp(levels[j], xx[:, i], arange(nTimes))``, but everything is computed by
+    a single ``searchsorted`` on the stacked series (offset to be separated).
+    """
+    xx  = np.fmax.accumulate(asarray(xx, float), axis=0) # ignores (i.e. forward-fills) NaNs
+    x   = asarray(levels, float)
+    nT, nS = xx.shape
+    nan_ = np.isnan(xx[0])
+    xx[:, nan_] = 0
+
+    # Stack the series, each offset by K (> the range of any series, or of the levels),
+    # so that they remain sorted and separate.
+    K    = 3*np.max(abs(xx), initial=np.max(abs(x), initial=0)) or 1
+    offs = K*arange(nS)
+    keys = (xx + offs).T.ravel()
+    j    = np.searchsorted(keys, x + offs[:, None], side="right") - 1
+    j    = (j - nT*arange(nS)[:, None]).clip(0, nT-2) # index within series
+
+    # Interpolate (and extrapolate as a constant, as np.interp)
+    i  = arange(nS)[:, None]
+    x0, x1 = xx[j, i], xx[j+1, i]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        w = np.where(x1 > x0, (x - x0)/(x1 - x0), x >= x1)
+    L = j + w.clip(0, 1)
+    L[nan_] = nan
+    return L
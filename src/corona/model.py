@@ -62,6 +62,19 @@ class SEIR2:
         "R_sevr"     ,  # [8]
         "R_fatl"     ,  # [9]
         ])
+
+    def Rep(self, t):
+        "Reproduction number in effect at time t (intervention switch)."
+        if self.t_intervention < t < (self.t_intervention+self.dt_intervention):
+            return self.Rep_intervention
+        else:
+            return self.Rep0
+
+    @property
+    def t_switches(self):
+        """Times where dxdt is discontinuous (``tstops`` for ``integrate_adaptive``)."""
+        return self.t_intervention, self.t_intervention+self.dt_intervention
+
     # Convenience:
     def init_state(self,**kwargs):
         """Init with kwargs and set susceptible = 1-everything_else."""
@@ -72,13 +85,15 @@ class SEIR2:
 
     def dxdt(self, state, t):
         "Dynamics."
-        x = self.Variables(*state.T)
+        if state.ndim==1:
+            # Python floats are faster than numpy scalars (and bit-identical).
+            state = state.tolist()
+        else:
+            state = state.T
+        x = self.Variables(*state)
 
         # ------ Intervention switch ------
-        if self.t_intervention < t < (self.t_intervention+self.dt_intervention):
-            beta = self.Rep_intervention
-        else:
-            beta = self.Rep0
+        beta = self.Rep(t)
 
         # ------ SEI (transmission dynamics) ------
         # Fluxes
@@ -109,6 +124,300 @@ class SEIR2:
 
         return np.asarray([dS, dE, dI, dQ_mild, dQ_sevr, dH, dQ_fatl, dR_mild, dR_sevr, dR_fatl]).T
 
+    def dxdt_into(self, state, t, out):
+        """Same as ``dxdt``, but write to ``out`` (same shape as ``state``).
+
+        No temporaries are allocated: the columns of ``out`` hold the fluxes
+        until they are turned into the changes. Use column-major (Fortran)
+        ``state`` and ``out`` for ensembles so that each variable is contiguous.
+        The operations are those of ``dxdt`` (in the same order),
+        so the results are bit-identical.
+        """
+        if state.ndim==1:
+            # Ufunc overhead dominates for a single state.
+            out[:] = self.dxdt(state, t)
+            return out
+
+        # Views with the variables along axis 0
+        x = state.T
+        o = out.T
+
+        # ------ Intervention switch ------
+        beta = self.Rep(t)
+
+        # ------ SEI fluxes ------
+        np.multiply(x[0], x[2], out=o[0])
+        np.divide  (o[0], self.dt_I, out=o[0])
+        np.multiply(o[0], beta, out=o[0])           # S2E
+        np.divide  (x[1], self.dt_E, out=o[1])      # E2I
+        np.divide  (x[2], self.dt_I, out=o[2])      # I2Q
+
+        # ------ IQR (clinical dynamics) ------
+        np.divide  (x[3], self.dt_Q_mild, out=o[7]) # Q2R_mild = dR_mild
+        np.divide  (x[6], self.dt_Q_fatl, out=o[9]) # Q2R_fatl = dR_fatl
+        np.divide  (x[4], self.dt_Q_sevr, out=o[5]) # Q2H
+        np.divide  (x[5], self.dt_H     , out=o[8]) # H2R      = dR_sevr
+        np.multiply(o[2], self.pMild, out=o[3])
+        np.subtract(o[3], o[7], out=o[3])           # dQ_mild
+        np.multiply(o[2], self.pDead, out=o[6])
+        np.subtract(o[6], o[9], out=o[6])           # dQ_fatl
+        np.multiply(o[2], self.pSevr, out=o[4])
+        np.subtract(o[4], o[5], out=o[4])           # dQ_sevr
+        np.subtract(o[5], o[8], out=o[5])           # dH
+
+        # ------ SEI changes ------
+        np.subtract(o[1], o[2], out=o[2])           # dI
+        np.subtract(o[0], o[1], out=o[1])           # dE
+        np.negative(o[0], out=o[0])                 # dS
+        return out
+
+    def jacobian(self, state, t):
+        """Jacobian of dxdt: ``J[..., i, j] = d(dxdt_i)/d(state_j)``.
+
+        ``state`` may be a batch (N, nVars), and the params arrays (N,).
+        """
+        x    = self.Variables(*np.moveaxis(state, -1, 0))
+        beta = self.Rep(t)
+        params = [getattr(self, f.name) for f in dcs.fields(SEIR2)]
+        J = zeros(np.broadcast(x.Susceptible, *params).shape + 2*(len(x),))
+
+        # SEI
+        J[..., 0, 0] = -beta * x.Infected    / self.dt_I
+        J[..., 0, 2] = -beta * x.Susceptible / self.dt_I
+        J[..., 1, 0] = -J[..., 0, 0]
+        J[..., 1, 2] = -J[..., 0, 2]
+        J[..., 1, 1] = -1 / self.dt_E
+        J[..., 2, 1] = +1 / self.dt_E
+        J[..., 2, 2] = -1 / self.dt_I
+        # IQR (linear)
+        J[..., 3, 2] = self.pMild / self.dt_I
+        J[..., 4, 2] = self.pSevr / self.dt_I
+        J[..., 6, 2] = self.pDead / self.dt_I
+        J[..., 3, 3] = -1 / self.dt_Q_mild
+        J[..., 4, 4] = -1 / self.dt_Q_sevr
+        J[..., 5, 4] = +1 / self.dt_Q_sevr
+        J[..., 5, 5] = -1 / self.dt_H
+        J[..., 6, 6] = -1 / self.dt_Q_fatl
+        J[..., 7, 3] = +1 / self.dt_Q_mild
+        J[..., 8, 5] = +1 / self.dt_H
+        J[..., 9, 6] = +1 / self.dt_Q_fatl
+        return J
+
+    # ------ Splitting: SEI (nonlinear) + IQR (linear) ------
+    _IQR_params = ["dt_I", "pDead", "pSevr", "dt_Q_mild", "dt_Q_fatl", "dt_Q_sevr", "dt_H"]
+
+    def dxdt_SEI(self, sei, t):
+        "The SEI block of dxdt (which does not depend on the IQR block)."
+        S, E, I = np.moveaxis(sei, -1, 0)
+        beta = self.Rep(t)
+        S2E = S * I / self.dt_I * beta
+        E2I = E     / self.dt_E
+        I2Q = I     / self.dt_I
+        return np.stack([-S2E, +S2E - E2I, -I2Q + E2I], -1)
+
+    def dxdt_SEI_into(self, sei, t, out):
+        "Same as ``dxdt_SEI``, but write to ``out`` (see ``dxdt_into``)."
+        if sei.ndim==1:
+            # Ufunc overhead dominates for a single state.
+            S, E, I = sei
+            S2E = S * I / self.dt_I * self.Rep(t)
+            E2I = E     / self.dt_E
+            I2Q = I     / self.dt_I
+            out[0] = -S2E
+            out[1] = +S2E - E2I
+            out[2] = -I2Q + E2I
+            return out
+        x = sei.T
+        o = out.T
+        beta = self.Rep(t)
+        np.multiply(x[0], x[2], out=o[0])
+        np.divide  (o[0], self.dt_I, out=o[0])
+        np.multiply(o[0], beta, out=o[0])           # S2E
+        np.divide  (x[1], self.dt_E, out=o[1])      # E2I
+        np.divide  (x[2], self.dt_I, out=o[2])      # I2Q
+        np.subtract(o[1], o[2], out=o[2])           # dI
+        np.subtract(o[0], o[1], out=o[1])           # dE
+        np.negative(o[0], out=o[0])                 # dS
+        return out
+
+    def propagator(self, dt):
+        """Exact propagator, over ``dt``, of the IQR block (variables [3:]).
+
+        The IQR block is linear:  q' = A q + c I(t).
+        Over a step, I(t) is taken as a cubic, whose derivatives
+        w = (I, dI, d2I, d3I) obey  w' = D w  (D: shift matrix).
+        Then (q, w) is linear & autonomous, and so
+        q(t+dt) = P @ (q(t), w(t)),  with P the upper rows of expm(M*dt).
+
+        P (shape (..., 7, 11)) is cached (in ``_propagators``), per IQR params and dt.
+        If the IQR params are shared by all members, P is 2D.
+        """
+        iqr = {k: np.asarray(getattr(self, k)) for k in self._IQR_params}
+        if all(np.all(v == v.flat[0]) for v in iqr.values()):
+            iqr = {k: v.flat[0] for k, v in iqr.items()}
+        key = (dt,) + tuple(np.asarray(v).tobytes() for v in iqr.values())
+        if key not in _propagators:
+            if len(_propagators) > 16:
+                _propagators.clear()
+            J = SEIR2(**iqr).jacobian(zeros(len(self.Variables._fields)), 0)
+            M = zeros(J.shape[:-2] + (11, 11))
+            M[..., :7, :7] = J[..., 3:, 3:] # A
+            M[..., :7,  7] = J[..., 3:, 2]  # c
+            M[..., 7, 8] = M[..., 8, 9] = M[..., 9, 10] = 1
+            _propagators[key] = sla.expm(M*dt)[..., :7, :]
+        return _propagators[key]
+
+
+# Cache of ``SEIR2.propagator``. Not an attribute, which would show up in ``vars(model)``.
+_propagators = {}
+
+
+class _IQRStepper:
+    """Apply the propagator ``P`` (see ``SEIR2.propagator``): ``out = P @ (q, w)``.
+
+    If ``P`` is member-wise (3D), it is applied column by column (as in ``dxdt_into``),
+    skipping the zero entries of the q-part (which is sparse),
+    which is much faster than a (batched) matrix product of such small matrices.
+    """
+
+    def __init__(self, P):
+        if P.ndim == 2:
+            self.PqT = P[:, :7].T.copy()
+            self.PwT = P[:, 7:].T.copy()
+            self.Pw  = None
+        else:
+            self.Pw  = [np.asfortranarray(P[:, :, j]) for j in range(7, 11)]
+            self.Pq  = [(i, j, None if np.all(P[:, i, j] == 1) else P[:, i, j].copy())
+                        for i, j in zip(*np.nonzero(np.any(P[:, :, :7] != 0, axis=0)))]
+            self.tmp = np.empty(P.shape[:2], order="F")
+
+    def __call__(self, q, w, out):
+        if self.Pw is None:
+            np.matmul(q, self.PqT, out=out)
+            out += w @ self.PwT
+            return out
+        tmp = self.tmp
+        np.multiply(self.Pw[0], w[:, [0]], out=out)
+        for j in range(1, 4):
+            np.multiply(self.Pw[j], w[:, [j]], out=tmp)
+            np.add(out, tmp, out=out)
+        for i, j, p in self.Pq:
+            if p is None:
+                np.add(out[:, i], q[:, j], out=out[:, i])
+            else:
+                np.multiply(p, q[:, j], out=tmp[:, 0])
+                np.add(out[:, i], tmp[:, 0], out=out[:, i])
+        return out
+
+
+def integrate_split(model, x0, tt):
+    """Integrate SEIR2 (or SEIR2Ensemble) over tt, splitting each step into:
+
+    - SEI: ``rk4`` (with ``dxdt_SEI_into``),
+    - IQR: exact, via ``model.propagator``, with I(t) taken as the cubic
+      Hermite interpolant of I and dI/dt at the ends of the step
+      (which is 4th order, consistent with ``rk4``).
+
+    The SEI block does not depend on the IQR block, so it is integrated first,
+    and dI/dt at the end of each step is the first ``rk4`` stage of the next one.
+    P is only recomputed if the step size changes.
+    Each ``xx[k]`` is column-major (as with ``integrate``), so that each variable is contiguous.
+    """
+    x0 = asarray(x0, dtype=float)
+    xx = zeros(tt.shape+x0.shape[::-1]).transpose(0, *range(x0.ndim, 0, -1))
+    xx[0] = x0
+
+    # SEI, and dI/dt
+    dI   = zeros(tt.shape+x0.shape[:-1])
+    step = RKStepper(model.dxdt_SEI_into, x0[..., :3].shape, inplace=True, layout="F")
+    for k,t in enumerate(tt[:-1]):
+        dt = tt[k+1] - t
+        step(xx[k, ..., :3], t, dt, out=xx[k+1, ..., :3])
+        dI[k] = step.k[0][..., 2] / dt
+    dI[-1] = model.dxdt_SEI(xx[-1, ..., :3], tt[-1])[..., 2]
+
+    # IQR
+    w    = np.empty(x0.shape[:-1]+(4,), order="F")
+    dt_P = None
+    for k,t in enumerate(tt[:-1]):
+        dt = tt[k+1] - t
+        if dt != dt_P:
+            P, dt_P = _IQRStepper(model.propagator(dt)), dt
+        # Cubic Hermite for I(t) -- as derivatives at t.
+        I0, I1 = xx[k, ..., 2], xx[k+1, ..., 2]
+        d0, d1 = dI[k], dI[k+1]
+        slope = (I1 - I0) / dt
+        w[..., 0] = I0
+        w[..., 1] = d0
+        w[..., 2] = 2*(3*slope - 2*d0 - d1) / dt
+        w[..., 3] = 6*(d0 + d1 - 2*slope) / dt**2
+        P(xx[k, ..., 3:], w, out=xx[k+1, ..., 3:])
+    return xx
+
+
+class SEIR2Ensemble(SEIR2):
+    """SEIR2 with one parameter set per ensemble member.
+
+    The parameters are held in ``params``, of shape (N, nParams),
+    with columns ordered as ``fields`` (all of the SEIR2 fields,
+    including the intervention timing). The fields (``Rep0``, etc.) are
+    views of the columns, so that assigning to either one updates the other.
+    The dynamics of all of the members are evaluated in one vectorized call,
+    with states of shape (N, nVars).
+    """
+    fields = tuple(f.name for f in dcs.fields(SEIR2))
+
+    def __init__(self, params):
+        params = np.array(params, dtype=float, ndmin=2, order="F")
+        if params.shape[1] != len(self.fields):
+            raise ValueError(f"params must have {len(self.fields)} columns "
+                             f"({', '.join(self.fields)}), not {params.shape[1]}.")
+        self.params = params
+
+    @classmethod
+    def from_kwargs(cls, N, base=None, **kwargs):
+        """Copy the parameters of ``base`` (a SEIR2) N times, then set ``kwargs``."""
+        unknown = set(kwargs) - set(cls.fields)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}. "
+                             f"Valid: {', '.join(cls.fields)}.")
+        base = SEIR2() if base is None else base
+        params = np.empty((N, len(cls.fields)), order="F")
+        for i, k in enumerate(cls.fields):
+            params[:, i] = kwargs.get(k, getattr(base, k))
+        return cls(params)
+
+    @classmethod
+    def from_models(cls, models):
+        "Stack a list of SEIR2 instances."
+        return cls([[getattr(m, k) for k in cls.fields] for m in models])
+
+    def __len__(self):
+        return len(self.params)
+
+    def __getitem__(self, idx):
+        "Select members (rows of ``params``)."
+        return SEIR2Ensemble(self.params[idx])
+
+    def Rep(self, t):
+        """Same as ``SEIR2.Rep``, but the switch is member-wise."""
+        t1 = self.t_intervention
+        t2 = t1 + self.dt_intervention
+        return np.where((t1 < t) & (t < t2), self.Rep_intervention, self.Rep0)
+
+    @property
+    def t_switches(self):
+        return tuple(np.unique(super().t_switches))
+
+
+def _column(i):
+    def fget(self): return self.params[:, i]
+    def fset(self, value): self.params[:, i] = value
+    return property(fget, fset)
+
+for _i, _k in enumerate(SEIR2Ensemble.fields):
+    setattr(SEIR2Ensemble, _k, _column(_i))
+
 
 def with_diagnostics(cls):
     """Add some diagnostical (using the prognostic) variables."""
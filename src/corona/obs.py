@@ -0,0 +1,55 @@
+"""Loading of observation files, e.g. ``Norway.txt`` (as written by ``dash1.py``).
+
+The text file is parsed once, into a binary cache (``<file>.npz``)
+with the dates (as integer days) and the (float) columns.
+The cache is used as long as the file's size and mtime,
+or else its content (hash), are unchanged.
+"""
+import hashlib
+
+from corona.utils import *
+from corona.maths import *
+
+
+def _parse(path):
+    "Parse the whitespace-separated table (with a header and a date column)."
+    with open(path, "rb") as F: # bytes: faster conversions
+        header = F.readline().decode().split()
+        tokens = np.array(F.read().split()).reshape(-1, len(header))
+    dates = tokens[:, 0].astype("datetime64[D]")
+    return header[1:], dates.astype(int), tokens[:, 1:].astype(float)
+
+
+def _hash(path):
+    with open(path, "rb") as F:
+        return hashlib.sha1(F.read()).hexdigest()
+
+
+def load(path, date0=None, cache=True):
+    """Load the obs. file ``path``.
+
+    Returns ``days``: the (int) days relative to ``date0`` (default: the first date),
+    and a dict of the (float) columns.
+    """
+    stat  = os.stat(path)
+    stamp = array([stat.st_size, stat.st_mtime_ns])
+    cfile = f"{path}.npz"
+
+    data, stale = None, True
+    if cache and os.path.exists(cfile):
+        with np.load(cfile) as c:
+            stale = not np.array_equal(c["stamp"], stamp)
+            if not stale or str(c["hash"]) == _hash(path):
+                data = str(c["fields"]).split(), c["days"], c["values"]
+    if data is None:
+        data = _parse(path)
+    fields, days, values = data
+    if cache and stale:
+        np.savez(cfile, stamp=stamp, hash=_hash(path),
+                 fields=" ".join(fields), days=days, values=values)
+
+    if date0 is not None:
+        days = days - np.datetime64(date0, "D").astype(int)
+    else:
+        days = days - days[0]
+    return days, dict(zip(fields, values.T))
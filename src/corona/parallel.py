@@ -0,0 +1,69 @@
+"""Ensemble integration on a pool of processes.
+
+The members (rows of ``E0``) are split into contiguous slices,
+one per worker, and each worker integrates its slice directly into
+a shared-memory output array (trajectories are not pickled).
+The members do not interact, so the result is identical
+to that of the serial ``integrate(model.dxdt, E0, tt)``.
+"""
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from corona.maths import *
+from corona.model import SEIR2Ensemble
+
+
+def _attach(name, shape):
+    "View of the shared-memory array ``name``."
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, buffer=shm.buf)
+
+
+def _work(model, E0, tt, name, shape, sl, order):
+    shm, xx = _attach(name, shape)
+    try:
+        E0 = np.asfortranarray(E0)
+        integrate(model.dxdt_into, E0, tt, order, inplace=True, out=xx[:, sl])
+    finally:
+        del xx
+        shm.close()
+
+
+def integrate_parallel(model, E0, tt, nproc=None, order=4):
+    """Same as ``integrate(model.dxdt, E0, tt)``, with the members split over processes.
+
+    - ``model``: a SEIR2, or a SEIR2Ensemble (whose rows are then split along with E0).
+    - ``nproc``: number of processes (default: ``os.cpu_count()``).
+
+    The returned array is backed by shared memory, which is freed
+    when the array is garbage collected.
+    """
+    E0    = asarray(E0, dtype=float)
+    N     = len(E0)
+    nproc = min(N, nproc or os.cpu_count())
+    shape = tt.shape + E0.shape
+    bounds = np.linspace(0, N, nproc+1).astype(int)
+    slices = [slice(a, b) for a, b in zip(bounds[:-1], bounds[1:])]
+
+    shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape))*8)
+    xx  = np.ndarray(shape, buffer=shm.buf)
+    weakref.finalize(xx, _free, shm)
+    try:
+        with ProcessPoolExecutor(nproc) as pool:
+            jobs = [pool.submit(_work,
+                                model[sl] if isinstance(model, SEIR2Ensemble) else model,
+                                E0[sl], tt, shm.name, shape, sl, order)
+                    for sl in slices]
+            for job in jobs:
+                job.result()
+    except BaseException:
+        del xx
+        raise
+    return xx
+
+
+def _free(shm):
+    shm.close()
+    shm.unlink()
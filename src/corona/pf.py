@@ -0,0 +1,63 @@
+"""Particle filter (PF) analysis, e.g. with a negative binomial likelihood for counts.
+
+Works on the same (augmented) ensembles ``E`` (N, M) as ``corona.enkf``.
+Unlike the EnKF, no Gaussianity is assumed.
+"""
+from corona.maths import *
+
+
+def nbinom_logpdf(y, mu, r):
+    """Log-likelihood of the count ``y`` ~ NegBinomial with mean ``mu`` and dispersion ``r``.
+
+    The variance is ``mu + mu**2/r``, i.e. Poisson as r -> inf.
+    """
+    from scipy.special import gammaln, xlogy
+    mu = np.maximum(mu, 1e-300)
+    return (gammaln(y + r) - gammaln(r) - gammaln(y + 1)
+            + r*log(r/(r + mu)) + xlogy(y, mu/(r + mu)))
+
+
+def systematic_resample(w, rng=np.random):
+    """Indices of a systematic resampling (sorted) from the normalized weights ``w``.
+
+    O(N): the number of copies of particle i is the number of the points
+    ``(u + j)/N``, j=0..N-1, that fall within its slice of ``cumsum(w)``.
+    """
+    N  = len(w)
+    u  = rng.random()
+    cw = np.concatenate([[0], cumsum(w)]) * N
+    cw[-1] = N
+    counts = diff(np.ceil(cw - u).clip(0, N)).astype(int)
+    return np.repeat(arange(N), counts)
+
+
+def analysis(E, loglik, rng=np.random, jitter=0, cols=slice(None)):
+    """PF analysis: weight by ``loglik`` (N,) and resample (systematically).
+
+    Non-finite ``loglik`` (e.g. of diverged members) get zero weight.
+
+    - ``jitter``: regularization, to avoid degeneracy of the (static) parameters.
+      The resampled ``E[:, cols]`` are perturbed by Gaussian noise
+      with ``jitter`` times the ensemble spread.
+      Columns that are all positive are perturbed in log space (so they stay positive).
+
+    Returns the resampled ensemble, and the effective sample size (of the weights).
+    """
+    loglik = np.where(np.isfinite(loglik), loglik, -np.inf)
+    if np.isfinite(loglik).any():
+        logw = loglik - np.max(loglik)
+    else:
+        logw = zeros(len(E)) # No information
+    w    = exp(logw)
+    w   /= w.sum()
+    ess  = 1 / np.sum(w**2)
+
+    E = E[systematic_resample(w, rng)]
+    if jitter:
+        X   = E[:, cols]
+        pos = np.all(X > 0, 0)
+        X[:, pos] = log(X[:, pos])
+        X  += jitter * np.std(X, 0) * rng.standard_normal(X.shape)
+        X[:, pos] = exp(X[:, pos])
+        E[:, cols] = X
+    return E, ess
@@ -3,15 +3,19 @@
 from corona.utils import *
 from corona.maths import *
 
-import matplotlib as mpl
-import matplotlib.pyplot as plt 
-plt.ion()
+# matplotlib is slow to import, so only load it when used
+# (and then turn on interactive mode, as was done on import).
+def _ion(module):
+    import matplotlib.pyplot
+    matplotlib.pyplot.ion()
 
+mpl       = LazyModule("matplotlib"       , on_import=_ion)
+plt       = LazyModule("matplotlib.pyplot", on_import=_ion)
+mdates    = LazyModule("matplotlib.dates" , on_import=_ion)
+mpl_tools = LazyModule("mpl_tools"        , on_import=_ion)
 
-from datetime import datetime, timedelta, timezone
-import matplotlib.dates as mdates
 
-import mpl_tools
+from datetime import datetime, timedelta, timezone
 
 # Coloschemes - https://www.schemecolor.com
 palettes = {}
@@ -0,0 +1,107 @@
+"""Prior distributions, e.g. of the SEIR2 parameters, and their (batched) sampling."""
+import functools
+
+from corona.utils import *
+from corona.maths import *
+
+
+@functools.lru_cache(maxsize=None)
+def iChi2(mean, var=None):
+    """Scaled inverse-chi-square distribution (i.e. inverse-gamma) with the given moments.
+
+    Default ``var``: ``(mean/10)**2``.
+    """
+    if var is None:
+        var = (mean/10)**2
+    nu = 4 + 2*mean**2/var
+    s  = mean*(nu-2)/nu
+    return ss.invgamma(a=nu/2, scale=nu/2*s)
+
+
+@functools.lru_cache(maxsize=None)
+def logNorm(mean, var):
+    "Log-normal distribution with the given moments."
+    sig2 = log(1 + var/mean**2)
+    mu   = log(mean/exp(sig2/2))
+    return ss.lognorm(s=sqrt(sig2), scale=exp(mu))
+
+
+def rvs(dist, N, rng=np.random):
+    """Same as ``dist.rvs(N)``, but faster for the (frozen) distributions made above."""
+    name, kw = dist.dist.name, dist.kwds
+    loc, scale = kw.get("loc", 0), kw.get("scale", 1)
+    if name == "invgamma" and not dist.args and set(kw) <= {"a", "loc", "scale"}:
+        return loc + scale / rng.standard_gamma(kw["a"], N)
+    if name == "lognorm" and not dist.args and set(kw) <= {"s", "loc", "scale"}:
+        return loc + scale * exp(kw["s"] * rng.standard_normal(N))
+    return dist.rvs(N, random_state=rng)
+
+
+@dcs.dataclass
+class Prior:
+    """Joint distribution of named quantities.
+
+    - ``marginals``  : dict of (independent) frozen scipy distributions.
+    - ``gauss``      : dict mapping a tuple of names to the (mean, cov) of their
+                       joint Gaussian distribution.
+    - ``constraints``: list of functions of a sample (dict of arrays) returning
+                       the mask of the admissible members.
+                       The others are redrawn (rejection sampling).
+
+    Example::
+
+      prior = Prior(dict(pDead=iChi2(.02), pSevr=iChi2(.2)),
+                    constraints=[lambda x: x["pDead"] + x["pSevr"] < 1])
+      prior.sample(10**6)["pDead"]
+    """
+    marginals  : dict = dcs.field(default_factory=dict)
+    gauss      : dict = dcs.field(default_factory=dict)
+    constraints: list = dcs.field(default_factory=list)
+
+    def _draw(self, N, rng, engine=None):
+        if engine is None:
+            x = {k: rvs(d, N, rng) for k, d in self.marginals.items()}
+            Z = lambda d: rng.standard_normal((N, d))
+        else:
+            # Quasi-random: transform uniforms via the inverse CDFs.
+            U = engine.random(N).T
+            x = {k: d.ppf(u) for (k, d), u in zip(self.marginals.items(), U)}
+            U = iter(U[len(x):])
+            Z = lambda d: ss.norm.ppf([next(U) for _ in range(d)]).T
+        for names, (mu, cov) in self.gauss.items():
+            L = nla.cholesky(cov)
+            x.update(zip(names, (mu + Z(len(names)) @ L.T).T))
+        return x
+
+    def _engine(self, method, rng):
+        if method == "mc":
+            return None
+        from scipy.stats import qmc
+        engines = dict(sobol=qmc.Sobol, halton=qmc.Halton, lhs=qmc.LatinHypercube)
+        if method not in engines:
+            raise ValueError(f"Unknown method: {method!r}.")
+        d    = len(self.marginals) + sum(len(names) for names in self.gauss)
+        seed = rng if isinstance(rng, np.random.Generator) else rng.randint(2**31)
+        return engines[method](d, seed=seed)
+
+    def sample(self, N, rng=np.random, method="mc", max_tries=100):
+        """Draw ``N`` (admissible) members. Returns a dict of arrays (N,).
+
+        ``method``: ``"mc"`` (plain random), or quasi-random: ``"sobol"``,
+        ``"halton"`` (low-discrepancy), or ``"lhs"`` (Latin hypercube).
+        The quasi-random ones give more accurate statistics for a given N
+        (Sobol works best with N a power of 2).
+        """
+        engine = self._engine(method, rng)
+        x = None
+        for _ in range(max_tries):
+            n    = N if x is None else N - len(next(iter(x.values())))
+            new  = self._draw(n, rng, engine)
+            mask = np.ones(n, bool)
+            for c in self.constraints:
+                mask &= c(new)
+            new = {k: v[mask] for k, v in new.items()}
+            x   = new if x is None else {k: np.concatenate([x[k], new[k]]) for k in x}
+            if len(next(iter(x.values()))) == N:
+                return x
+        raise RuntimeError(f"Could not draw {N} admissible members in {max_tries} tries.")
@@ -0,0 +1,44 @@
+"""Recording of ensemble statistics, rather than of the full ensembles."""
+from corona.maths import *
+
+
+class Recorder:
+    """Per-time summaries of an ensemble ``E`` (N, M).
+
+    Stores the ``mean``, ``var`` (nT, M), and ``quantiles`` (nq, nT, M),
+    and the ``members`` (nT, n_members, M) of a fixed random subset (e.g. for plotting),
+    i.e. O(nT M) memory, rather than O(nT N M) for the full ensembles.
+
+    Example::
+
+      rec = Recorder(len(tt), N, M, n_members=60)
+      for k in range(len(tt)):
+          ...
+          rec(k, E)
+    """
+
+    def __init__(self, nT, N, M, quantiles=(.1, .5, .9), n_members=0, rng=np.random):
+        self.quantiles = array(quantiles)
+        self.mean      = np.full((nT, M), nan)
+        self.var       = np.full((nT, M), nan)
+        self.q         = np.full((len(self.quantiles), nT, M), nan)
+        self.i_members = np.sort(rng.choice(N, n_members, replace=False))
+        self.members   = np.full((nT, n_members, M), nan)
+
+    def __call__(self, k, E):
+        "Record the stats of ``E`` at time index ``k``."
+        self.mean[k]    = mean(E, 0)
+        self.var[k]     = np.var(E, 0, ddof=1)
+        self.q[:, k]    = np.quantile(E, self.quantiles, 0)
+        self.members[k] = E[self.i_members]
+
+    @property
+    def std(self):
+        return sqrt(self.var)
+
+    def rescale(self, factor, cols=slice(None)):
+        "Multiply (in place) the records of ``cols`` by ``factor`` (e.g. population size)."
+        self.mean[:, cols]       *= factor
+        self.var[:, cols]        *= factor**2
+        self.q[:, :, cols]       *= factor
+        self.members[:, :, cols] *= factor
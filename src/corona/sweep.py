@@ -0,0 +1,79 @@
+"""Scenario sweeps: integrate many SEIR2 parameter sets in one batch.
+
+Example::
+
+  res = sweep(grid(Rep_intervention=[.5, .7, .9], t_intervention=arange(20, 120, 10)),
+              SEIR2().init_state(Infected=1e-6), linspace(0, 365, 366))
+  res.sel("R_fatl", Rep_intervention=.7)[:, -1]
+"""
+import itertools
+from time import perf_counter
+
+from corona.utils import *
+from corona.maths import *
+from corona.model import SEIR2, SEIR2Ensemble
+
+
+def grid(**values):
+    """Cartesian product of the parameter ``values``, as a DataFrame (row: scenario)."""
+    rows = itertools.product(*values.values())
+    return pd.DataFrame(list(rows), columns=list(values))
+
+
+@dcs.dataclass
+class SweepResult:
+    """Labelled result of ``sweep``.
+
+    ``xx[i, k, j]`` is variable ``j`` at time ``tt[k]`` in scenario ``i``,
+    whose parameters are in row ``i`` of ``params``.
+    """
+    params    : "pd.DataFrame"
+    tt        : np.ndarray
+    variables : tuple
+    xx        : np.ndarray
+    throughput: float # scenarios per second
+
+    def sel(self, variable=None, **params):
+        """Select by variable name and parameter values.
+
+        Returns an array of shape (nScenarios, nTimes[, nVars]).
+        """
+        mask = np.ones(len(self.params), bool)
+        for k, v in params.items():
+            mask &= np.isclose(self.params[k].to_numpy(), v)
+        xx = self.xx[mask]
+        if variable is not None:
+            xx = xx[..., self.variables.index(variable)]
+        return xx
+
+    def to_frame(self):
+        "Long-format DataFrame, indexed by (params..., t), with a column per variable."
+        nS, nT, nV = self.xx.shape
+        index = self.params.loc[np.repeat(np.arange(nS), nT)].reset_index(drop=True)
+        index["t"] = np.tile(self.tt, nS)
+        index = pd.MultiIndex.from_frame(index)
+        return pd.DataFrame(self.xx.reshape(nS*nT, nV), index=index, columns=self.variables)
+
+
+def sweep(scenarios, x0, tt, base=None, save_every=1, verbose=True):
+    """Integrate all ``scenarios`` in one vectorized (``SEIR2Ensemble``) run.
+
+    - ``scenarios``: DataFrame (e.g. from ``grid``), or list of dicts,
+      with (a subset of) the SEIR2 fields. The other fields are taken from ``base``.
+    - ``x0``: initial state, shared (nVars,), or per scenario (N, nVars).
+    - ``save_every``: see ``integrate``.
+    """
+    scenarios = pd.DataFrame(scenarios)
+    N     = len(scenarios)
+    model = SEIR2Ensemble.from_kwargs(N, base or SEIR2(),
+                                      **{k: scenarios[k].to_numpy() for k in scenarios})
+    E0    = np.asfortranarray(x0 + zeros((N, len(SEIR2.Variables._fields))))
+
+    t0 = perf_counter()
+    xx = integrate(model.dxdt_into, E0, tt, inplace=True, save_every=save_every)
+    throughput = N / (perf_counter() - t0)
+    if verbose:
+        print(f"Swept {N} scenarios: {throughput:.0f} scenarios/s.")
+
+    return SweepResult(scenarios, tt[::save_every], SEIR2.Variables._fields,
+                       xx.transpose(1, 0, 2), throughput)
@@ -13,7 +13,39 @@ import dataclasses as dcs
 from collections import namedtuple
 # from typing import Optional, Any
 
-import pandas as pd
+import importlib
+class LazyModule:
+    """Stand-in for a module, which is only imported on first use (attribute access).
+
+    For heavy dependencies, which need not be loaded by, e.g., batch workers.
+
+    Example::
+
+      pd = LazyModule("pandas")
+    """
+    def __init__(self, name, on_import=None):
+        self._name      = name
+        self._on_import = on_import
+        self._module    = None
+
+    def _load(self):
+        if self._module is None:
+            module = importlib.import_module(self._name)
+            if self._on_import:
+                self._on_import(module)
+            self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r}>"
+
+pd = LazyModule("pandas")
 
 import time
 class Timer():
@@ -33,3 +33,441 @@ def test_SEIR2():
     assert np.allclose(xx[-1], xx1)
     return xx[-1]
 
+
+def test_dxdt_into():
+    model = SEIR2()
+    for x in [rand(10), np.asfortranarray(rand(300, 10))]:
+        for t in [0, model.t_intervention+1]:
+            out = np.empty_like(x)
+            assert model.dxdt_into(x, t, out) is out
+            assert np.array_equal(out, model.dxdt(x, t))
+
+def test_RKStepper():
+    model = SEIR2()
+    tt = linspace(0, 200, 201)
+    for x0 in [model.init_state(Infected=1e-6),
+               np.asfortranarray(rand(3, 10)/10)]:
+        for order in [1, 2, 3, 4]:
+            xx = [x0]
+            for k,t in enumerate(tt[:-1]):
+                xx.append(rk4(model.dxdt, xx[k], t, tt[k+1]-t, order))
+            assert np.array_equal(xx, integrate(model.dxdt, x0, tt, order))
+            assert np.array_equal(xx, integrate(model.dxdt_into, x0, tt, order, inplace=True))
+
+def test_integrate_adaptive():
+    model = SEIR2()
+    nPop  = 7*10**6
+    x0    = model.init_state(Infected=1/nPop)
+    tt    = linspace(0, 200, 201)
+
+    # Reference: RK4 with dt=0.01 (the RK4 error is O(dt) at the switches)
+    tt_ref = linspace(0, 200, 20001)
+    xx_ref = integrate(model.dxdt, x0, tt_ref)[::100]
+
+    xx, nfev = integrate_adaptive(model.dxdt, x0, tt, tstops=model.t_switches)
+    assert np.allclose(nPop*xx, nPop*xx_ref, atol=1e3)
+    assert nfev < 1000
+
+def test_SEIR2Ensemble():
+    models = [SEIR2(Rep0=2+i/10, t_intervention=80+10*i) for i in range(5)]
+    ens    = SEIR2Ensemble.from_models(models)
+    assert np.array_equal(ens.Rep0, ens.params[:, ens.fields.index("Rep0")])
+    x = np.asfortranarray(rand(5, 10))
+    for t in [0, 95, 115, 200]:
+        dx = [m.dxdt(x[i], t) for i, m in enumerate(models)]
+        assert np.array_equal(ens.dxdt(x, t), dx)
+
+def test_jit():
+    pytest.importorskip("numba")
+    from corona import jit
+    tt  = linspace(0, 365, 366)
+    ens = SEIR2Ensemble.from_kwargs(20, Rep0=2+rand(20), t_intervention=100*rand(20))
+    E0  = ens.init_state(Infected=1e-6) + zeros((20, 10))
+    xx  = jit.integrate_seir2(ens, E0, tt, "numba")
+    assert np.allclose(xx, integrate(ens.dxdt, E0, tt), rtol=0, atol=1e-12)
+
+def test_ros2():
+    model = SEIR2(dt_Q_sevr=1e-3)
+    x, eps = rand(10), 1e-7
+    J = [(model.dxdt(x + eps*e, 0) - model.dxdt(x, 0))/eps for e in eye(10)]
+    assert np.allclose(model.jacobian(x, 0), array(J).T, atol=1e-6)
+
+    # Stiff: rk4 blows up, ros2 does not.
+    x0 = model.init_state(Infected=1e-3)
+    tt = linspace(0, 60, 241)
+    xx_ref = integrate_stiff(model.dxdt, model.jacobian, x0, linspace(0, 60, 3841))[::16]
+    with np.errstate(all="ignore"):
+        assert not np.isfinite(integrate(model.dxdt, x0, tt)).all()
+    assert np.allclose(integrate_stiff(model.dxdt, model.jacobian, x0, tt), xx_ref, atol=1e-3)
+
+    # Batch
+    ens = SEIR2Ensemble.from_kwargs(3, model, Rep0=[2, 2.2, 2.4])
+    E0  = x0 + zeros((3, 10))
+    xx  = integrate_stiff(ens.dxdt, ens.jacobian, E0, tt)
+    assert np.allclose(xx[:, 1], integrate_stiff(model.dxdt, model.jacobian, x0, tt))
+
+def test_integrate_split():
+    model = SEIR2(t_intervention=1000) # Smooth
+    x0 = model.init_state(Infected=1e-6)
+    tt = linspace(0, 365, 366)
+    xx_ref, _ = integrate_adaptive(model.dxdt, x0, tt, rtol=1e-10, atol=1e-14)
+    xx = integrate_split(model, x0, tt)
+    err_rk4   = abs(integrate(model.dxdt, x0, tt) - xx_ref)[:, 3:].max()
+    err_split = abs(xx - xx_ref)[:, 3:].max()
+    assert err_split < err_rk4 < 1e-5
+    assert "_propagators" not in vars(model) # e.g. da1.py lists the parameters from vars
+
+    # Ensemble, with member-wise IQR params
+    ens = SEIR2Ensemble.from_kwargs(3, model, pDead=[.01, .02, .03])
+    xx  = integrate_split(ens, x0 + zeros((3, 10)), tt)
+    assert np.allclose(xx[:, 1], integrate_split(model, x0, tt), rtol=0, atol=1e-14)
+
+def test_integrate_save():
+    model = SEIR2()
+    x0 = model.init_state(Infected=1e-6) + zeros((4, 10))
+    tt = linspace(0, 200, 2001)
+    xx = integrate(model.dxdt, x0, tt)
+    assert np.array_equal(xx[::10], integrate(model.dxdt, x0, tt, save_every=10))
+    assert np.array_equal(xx[[5, 1000]], integrate(model.dxdt, x0, tt, save_at=tt[[5, 1000]]))
+    assert integrate(model.dxdt, x0, tt, save_at=[]).shape == (0, 4, 10)
+    tx = list(integrate_iter(model.dxdt, x0, tt, every=100))
+    assert np.array_equal([t for t, x in tx], tt[::100])
+    assert np.array_equal([x for t, x in tx], xx[::100])
+
+def test_integrate_parallel():
+    from corona.parallel import integrate_parallel
+    ens = SEIR2Ensemble.from_kwargs(30, Rep0=2+rand(30))
+    E0  = ens.init_state(Infected=1e-6) + zeros((30, 10))
+    tt  = linspace(0, 100, 101)
+    assert np.array_equal(integrate_parallel(ens, E0, tt, nproc=3),
+                          integrate(ens.dxdt, E0, tt))
+
+def test_sweep():
+    from corona.sweep import grid, sweep
+    x0  = SEIR2().init_state(Infected=1e-6)
+    tt  = linspace(0, 200, 201)
+    res = sweep(grid(Rep0=[2, 3], t_intervention=[50, 100]), x0, tt, verbose=False)
+    xx  = integrate(SEIR2(Rep0=3, t_intervention=50).dxdt, x0, tt)
+    assert np.array_equal(res.sel(Rep0=3, t_intervention=50)[0], xx)
+    assert np.array_equal(res.sel("R_fatl", Rep0=3, t_intervention=50)[0], xx[:, 9])
+    assert res.to_frame().shape == (4*201, 10)
+    with pytest.raises(ValueError, match="Rep_0"):
+        sweep(grid(Rep_0=[2, 3]), x0, tt, verbose=False)
+
+def test_enkf_analysis():
+    from corona.enkf import analysis
+    # More obs than members, correlated obs errors, linear Obs.
+    N, M, p = 5, 12, 8
+    E = randn(N, M)
+    H = randn(p, M)
+    R = np.cov(randn(p, 3*p)) + .1*eye(p)
+    y = randn(p)
+    Ea = analysis(E, y, R, lambda x: x @ H.T)
+
+    # Compare with the Kalman update (of the ensemble mean and covariance)
+    A = E - E.mean(0)
+    P = A.T @ A / (N-1)
+    K = P @ H.T @ nla.inv(H @ P @ H.T + R)
+    Aa = Ea - Ea.mean(0)
+    assert np.allclose(Ea.mean(0), E.mean(0) + K @ (y - H @ E.mean(0)))
+    assert np.allclose(Aa.T @ Aa / (N-1), (eye(M) - K @ H) @ P)
+
+def test_etkf():
+    from corona.enkf import analysis, cost
+    H = randn(6, 12)
+    for N in [5, 40]:
+        E = randn(3, N, 12) # batch of 3
+        y = randn(3, 6)
+        Ea = analysis(E, y, eye(6), lambda x: x @ H.T, method="svd")
+        Eb = analysis(E, y, eye(6), lambda x: x @ H.T, method="etkf")
+        assert np.allclose(Ea, Eb)
+    assert cost("auto", 5, 6, 12)[0] == "etkf"
+    assert cost("auto", 300, 1, 20)[0] == "svd"
+
+
+def test_pf():
+    import scipy.stats as ss
+    from corona import pf
+    y, mu, r = array([0, 3, 10]), array([2., 3.5, 7.]), 4.
+    assert np.allclose(pf.nbinom_logpdf(y, mu, r), ss.nbinom(r, r/(r+mu)).logpmf(y))
+
+    w   = rand(1000); w /= w.sum()
+    idx = pf.systematic_resample(w)
+    assert len(idx) == 1000
+    assert np.all(abs(np.bincount(idx, minlength=1000) - 1000*w) < 1)
+
+    E = rand(1000, 3)
+    Ea, ess = pf.analysis(E, log(E[:, 0]))
+    assert 1 < ess < 1000
+    assert Ea[:, 0].mean() > E[:, 0].mean()
+
+    # Diverged member
+    E = arange(5.)[:, None] + ones((5, 2))
+    Ea, ess = pf.analysis(E, array([0, -50, -50, -50, nan]))
+    assert ess < 1.01 and np.all(Ea == E[0])
+    Ea, ess = pf.analysis(E, array([nan, nan, -np.inf, nan, nan]))
+    assert np.isclose(ess, 5) and np.all(Ea == E)
+
+    # Jitter keeps positive params positive
+    E = np.column_stack([randn(1000), 1e-3*rand(1000)])
+    Ea, _ = pf.analysis(E, zeros(1000), jitter=10)
+    assert np.all(Ea[:, 1] > 0) and np.any(Ea[:, 0] < E[:, 0].min())
+
+
+def test_esmda():
+    from corona.enkf import analysis, esmda
+    H = randn(30, 4) # p > N
+    E = randn(20, 4)
+    y = randn(30)
+    R = np.diag(1 + rand(30))
+    Ea = analysis(E, y, R, lambda x: x @ H.T)
+    Eb = esmda(E, y, R, lambda x: x @ H.T, alphas=(3, 3, 3))
+    assert np.allclose(Ea, Eb)
+    with pytest.raises(ValueError):
+        esmda(E, y, R, lambda x: x @ H.T, alphas=(3, 3))
+
+
+def test_Recorder():
+    from corona.recorder import Recorder
+    EE  = rand(5, 100, 3)
+    rec = Recorder(5, 100, 3, n_members=10)
+    for k, E in enumerate(EE):
+        rec(k, E)
+    rec.rescale(2, [0])
+    EE[..., 0] *= 2
+    assert np.allclose(rec.mean, EE.mean(1))
+    assert np.allclose(rec.std, EE.std(1, ddof=1))
+    assert np.allclose(rec.q[1], np.median(EE, 1))
+    assert np.allclose(rec.members, EE[:, rec.i_members])
+
+
+def test_Prior():
+    import scipy.stats as ss
+    from corona.prior import Prior, iChi2, logNorm, rvs
+    assert iChi2(.02) is iChi2(.02) # cached
+    for d in [iChi2(.02, .01**2), logNorm(1, .2),
+              ss.lognorm(s=.5, loc=10), ss.invgamma(a=5, loc=10, scale=1), ss.invgamma(5, 10)]:
+        x = rvs(d, 10**5)
+        assert np.isclose(x.mean(), d.mean(), rtol=.02)
+        assert np.isclose(x.var(), d.var(), rtol=.1)
+
+    prior = Prior(dict(pDead=iChi2(.5, .2**2), pSevr=iChi2(.5, .2**2)),
+                  {("I", "E"): (array([1, 10]), eye(2))},
+                  [lambda x: x["pDead"] + x["pSevr"] < 1])
+    x = prior.sample(10**4)
+    assert all(len(v) == 10**4 for v in x.values())
+    assert np.all(x["pDead"] + x["pSevr"] < 1)
+    assert np.isclose(x["E"].mean(), 10, atol=.1)
+
+
+def test_Prior_qmc():
+    from corona.prior import Prior, iChi2
+    d     = iChi2(2.5, 1.5**2)
+    prior = Prior(dict(Rep0=d), {("I", "E"): (array([1, 10]), eye(2))})
+    rng   = np.random.default_rng(0)
+    for method in ["sobol", "halton", "lhs"]:
+        x = prior.sample(256, rng, method=method)
+        assert abs(x["Rep0"].mean() - d.mean()) < .1
+        assert abs(x["E"].mean() - 10) < .02
+    # Latin hypercube: one member per stratum (of each marginal)
+    x = prior.sample(100, rng, method="lhs")
+    assert np.all(np.sort(np.floor(100*d.cdf(x["Rep0"]))) == arange(100))
+
+
+def test_enkf_batched_R():
+    from corona.enkf import analysis
+    C, N, M = 4, 10, 5
+    E   = randn(C, N, M)
+    y   = randn(C, 1)
+    R   = 1 + rand(C, 1, 1)
+    Obs = lambda x: x[..., :1]
+    Ea  = analysis(E, y, R, Obs)
+    for c in range(C):
+        assert np.allclose(Ea[c], analysis(E[c], y[c], R[c], Obs))
+
+
+def test_checkpoint(tmp_path):
+    from corona import checkpoint
+    from corona.recorder import Recorder
+    path = tmp_path / "ckpt.npz"
+    rng  = np.random.default_rng(1)
+    rec  = Recorder(5, 10, 3, n_members=2, rng=rng)
+    rec(0, rand(10, 3))
+    E, yy = rand(10, 3), arange(3.)
+    checkpoint.save(path, 2, E, yy, dict(rec=rec), rng, meta="A")
+    u = rng.random()
+
+    rec2 = Recorder(5, 10, 3, n_members=2)
+    k, E2 = checkpoint.load(path, arange(4.), dict(rec=rec2), rng, meta="A")
+    assert k == 2 and np.all(E2 == E)
+    assert np.array_equal(rec2.mean, rec.mean, equal_nan=True)
+    assert rng.random() == u
+    # Invalidated by config or obs. revisions
+    assert checkpoint.load(path, yy, meta="B") is None
+    assert checkpoint.load(path, yy + 1, meta="A") is None
+
+    # Legacy (global) rng
+    np.random.seed(2)
+    checkpoint.save(path, 2, E, yy)
+    u = rand()
+    checkpoint.load(path, yy)
+    assert rand() == u
+
+
+def test_load_obs(tmp_path):
+    import time
+    from corona.obs import load
+    path = tmp_path / "Norway.txt"
+    path.write_text("      date  confirmed  deaths  recovered\n"
+                    "2020-02-25          0       0          0\n"
+                    "2020-02-26          1       0          0\n"
+                    "2020-02-27          3       1          0\n")
+    days, obs = load(path, "2020-02-26")
+    assert list(days) == [-1, 0, 1]
+    assert list(obs["confirmed"]) == [0, 1, 3]
+    assert os.path.exists(f"{path}.npz")
+    # From cache
+    days, obs = load(path)
+    assert list(days) == [0, 1, 2] and list(obs["deaths"]) == [0, 0, 1]
+    # Invalidated
+    time.sleep(.01)
+    path.write_text(path.read_text().replace("3       1", "3       2"))
+    assert list(load(path)[1]["deaths"]) == [0, 0, 2]
+
+
+def test_feed_Store(tmp_path):
+    import json
+    from corona.feed import Store
+    with open(os.path.join(os.path.dirname(__file__), "data", "timeseries.json")) as F:
+        feed = json.load(F)
+    head = {c: v[:6] for c, v in feed.items()}
+
+    store = Store(tmp_path)
+    assert store.refresh(head) == 6
+    assert Store(tmp_path).refresh(feed) == 4 # only the new days
+    assert store.refresh(feed) == 0
+
+    store = Store(tmp_path)
+    assert store.countries == ["Norway", "Sweden", "Italy"]
+    assert store.dates[0] == np.datetime64("2020-03-01") and len(store.dates) == 10
+    assert isinstance(store["deaths"], np.memmap)
+    assert np.all(store["deaths"][:, 2] == [d["deaths"] for d in feed["Italy"]])
+    assert np.all(store.country("Norway")["confirmed"] == [d["confirmed"] for d in feed["Norway"]])
+
+    # Revised past counts: rewrite from the first revised day
+    feed["Sweden"][7] = dict(feed["Sweden"][7], deaths=feed["Sweden"][7]["deaths"] + 1)
+    assert store.refresh(feed) == 3
+    assert np.all(store["deaths"][:, 1] == [d["deaths"] for d in feed["Sweden"]])
+    assert store.refresh(head) == 0 and store["deaths"].shape == (6, 3)
+
+    # Other countries: rebuild
+    assert store.refresh({"Norway": feed["Norway"]}) == 10
+    assert store["deaths"].shape == (10, 1)
+
+
+def test_feed_frame(tmp_path):
+    import json
+    from corona.feed import Store
+    with open(os.path.join(os.path.dirname(__file__), "data", "timeseries.json")) as F:
+        feed = json.load(F)
+    store = Store(tmp_path)
+    store.refresh(feed)
+    B = store.block()
+    assert B.shape == (10, 3, 3)
+    assert np.all(B[:, 1, 1] == store["deaths"][:, 1])
+    dfs = store.frame()
+    assert list(dfs["Italy"]["deaths"]) == [d["deaths"] for d in feed["Italy"]]
+    assert dfs["Sweden"].index[0] == np.datetime64("2020-03-01")
+
+
+def test_Fetcher(tmp_path):
+    import threading
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from corona.fetch import Fetcher
+    with open(os.path.join(os.path.dirname(__file__), "data", "timeseries.json"), "rb") as F:
+        body = F.read()
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(.3) # slow source
+            hits.append(self.headers.get("If-None-Match"))
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        urls = [f"http://127.0.0.1:{server.server_port}/{i}.json" for i in range(4)]
+        fetcher = Fetcher(tmp_path, max_age=3600, verbose=False)
+
+        t0 = time.perf_counter()
+        data = fetcher.json(*urls)
+        assert time.perf_counter() - t0 < 1 # concurrent: not 4*0.3
+        assert data[0]["Norway"][0]["confirmed"] == 19
+        assert len(hits) == 4
+
+        assert fetcher.fetch(*urls) == [body]*4 # fresh: from cache
+        assert len(hits) == 4
+
+        fetcher.max_age = 0 # stale: revalidate (304)
+        assert fetcher.fetch(*urls) == [body]*4
+        assert hits[4:] == ['"v1"']*4
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_lags():
+    from corona.maths import lags
+    xx = np.cumsum(rand(40, 5) * (rand(40, 5) < .5), 0) # with plateaus
+    levels = np.concatenate([[-1, 0, 100], xx[[3, 20], 0], 5*rand(10)])
+    L = lags(xx, levels)
+    assert L.shape == (5, 15)
+    for i in range(5):
+        assert np.allclose(L[i], np.interp(levels, xx[:, i], arange(40)))
+
+    # NaNs only affect their own series
+    xx[10, 1] = xx[0, 2] = nan
+    L2 = lags(xx, levels)
+    assert np.allclose(L2[[0, 3, 4]], L[[0, 3, 4]])
+    filled = np.where(np.isnan(xx[:, 1]), np.roll(xx[:, 1], 1), xx[:, 1])
+    assert np.allclose(L2[1], np.interp(levels, filled, arange(40)))
+    assert np.all(np.isnan(L2[2]))
+
+    # Small (per-capita) values
+    assert np.allclose(lags(1e-6*xx[:, [0, 3]], 1e-6*levels), L[[0, 3]], rtol=0, atol=1e-9)
+
+
+def test_lazy_imports():
+    import subprocess
+    import sys
+    code = ("import sys; from corona.model import SEIR2; import corona.plotting;"
+            "import corona.sweep, corona.feed, corona.prior, corona.pf, corona.enkf;"
+            "print(sorted({'pandas', 'scipy', 'matplotlib'} & set(sys.modules)))")
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env)
+    assert out.stdout.strip() == "[]"
+
+    # Interactive mode, whichever (lazy) module loads matplotlib first
+    for mod in ["plt", "mpl", "mdates", "mpl_tools"]:
+        code = (f"from corona.plotting import *; {mod}.__name__;"
+                "import matplotlib.pyplot; print(matplotlib.pyplot.isinteractive())")
+        out  = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                              env={**env, "MPLBACKEND": "Agg"})
+        assert out.stdout.strip() == "True"
+
+    from corona.maths import sla, inv
+    assert np.allclose(inv(2*eye(2)), eye(2)/2)
+    assert sla.expm(zeros((2, 2)))[0, 0] == 1